@@ -1,27 +1,52 @@
 import os
-import json
-from datetime import datetime
-from flask import Flask, request, send_file, render_template, jsonify
+import time
+import logging
+import tempfile
+from flask import Blueprint, Flask, Response, g, request, send_file, send_from_directory, render_template, jsonify, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import RequestTimeout
 from werkzeug.utils import secure_filename
 
 from utils.unified_detection import process_video_unified
+from utils.jobs import JobManager
+from utils.video_io import HLS_PLAYLIST
+from utils.live_stream import LiveSession, parse_source
+from utils.metrics import METRICS
+from utils.roi import RoadROI, load_camera_profiles, parse_roi
+from utils.detection_store import append_detections, build_detection_record, load_detections
+from utils.slots import HostSlots
+from utils.structured_logging import configure_logging
+from utils.thumbnails import THUMBNAIL_FORMATS, THUMBNAIL_MIMETYPES, THUMBNAIL_MODES, load_thumbnail_index
+from utils.uploads import DeadlineInput
+
+logger = logging.getLogger("hazard_api")
 
 # ------------------- Config -------------------
 ALLOWED_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm"}
+# Endpoints whose request body is a video upload (read under UPLOAD_TIMEOUT)
+UPLOAD_ENDPOINTS = {"api.detect_route", "api.create_job"}
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_DIR = os.path.join(BASE_DIR, "static", "uploads")
 RESULTS_DIR = os.path.join(BASE_DIR, "static", "results")
 DATA_DIR = os.path.join(BASE_DIR, "data")
+JOBS_DIR = os.path.join(RESULTS_DIR, "jobs")
+
+# Inference jobs (/detect, /jobs, /live) allowed at once on this host, across all workers
+MAX_INFERENCE_JOBS = int(os.environ.get("HAZARD_MAX_INFERENCE_JOBS", 1))
+SLOTS_DIR = os.environ.get("HAZARD_SLOTS_DIR", os.path.join(tempfile.gettempdir(), "hazard_detection_slots"))
+RETRY_AFTER_SECONDS = int(os.environ.get("HAZARD_RETRY_AFTER", 30))
 
-for folder in [UPLOAD_DIR, RESULTS_DIR, DATA_DIR]:
+for folder in [UPLOAD_DIR, RESULTS_DIR, DATA_DIR, JOBS_DIR]:
     os.makedirs(folder, exist_ok=True)
 
-app = Flask(__name__, static_folder="static", template_folder="templates")
-app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500 MB
+job_manager = JobManager(JOBS_DIR, max_workers=MAX_INFERENCE_JOBS)
+inference_slots = HostSlots(SLOTS_DIR, MAX_INFERENCE_JOBS)
+live_sessions = {}  # running sessions only; each removes itself when it ends
+
+api = Blueprint("api", __name__)
 
-CORS(app, resources={
+CORS_ORIGINS = {
     r"/*": {
         "origins": [
             "http://localhost:3000",
@@ -39,15 +64,83 @@ CORS(app, resources={
         "methods": ["GET", "POST", "OPTIONS"],
         "allow_headers": ["Content-Type"],
     }
-})
-
-# Add CORS headers to all responses
-@app.after_request
-def after_request(response):
-    response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-    return response
+}
+
+
+def create_app(config: dict = None) -> Flask:
+    """
+    Application factory (used by wsgi.py / gunicorn and `python app.py`).
+
+    Config (environment defaults): MAX_CONTENT_LENGTH (MAX_UPLOAD_MB),
+    UPLOAD_TIMEOUT (UPLOAD_TIMEOUT_SECONDS, deadline for the whole upload body), LOG_LEVEL, LOG_FORMAT ("json" | "text"), LOG_SAMPLE_RATE (share of
+    successful requests logged; errors are always logged).
+    """
+    app = Flask(__name__, static_folder="static", template_folder="templates")
+    app.config.update(
+        MAX_CONTENT_LENGTH=int(os.environ.get("MAX_UPLOAD_MB", 500)) * 1024 * 1024,
+        UPLOAD_TIMEOUT=float(os.environ.get("UPLOAD_TIMEOUT_SECONDS", 600)),
+        LOG_LEVEL=os.environ.get("LOG_LEVEL", "INFO"),
+        LOG_FORMAT=os.environ.get("LOG_FORMAT", "json"),
+        LOG_SAMPLE_RATE=float(os.environ.get("LOG_SAMPLE_RATE", 1.0)),
+    )
+    app.config.update(config or {})
+
+    configure_logging(app.config["LOG_LEVEL"], app.config["LOG_FORMAT"])
+    # Requests are logged once below; drop the dev server's duplicate access log
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    CORS(app, resources=CORS_ORIGINS)
+    app.register_blueprint(api)
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    # A slow or stalled upload must not hold a worker thread indefinitely
+    @app.before_request
+    def bound_upload_read():
+        if request.method == "POST" and request.endpoint in UPLOAD_ENDPOINTS:
+            g.upload_input = DeadlineInput(request.environ, app.config["UPLOAD_TIMEOUT"])
+
+    @app.teardown_request
+    def release_upload_read(exc):
+        upload_input = g.pop("upload_input", None)
+        if upload_input is not None:
+            upload_input.close()
+
+    @app.errorhandler(RequestTimeout)
+    def upload_timeout(e):
+        return jsonify({"error": "Upload timed out; retry on a faster connection"}), 408
+
+    # Add CORS headers to all responses
+    @app.after_request
+    def after_request(response):
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+        return response
+
+    @app.after_request
+    def log_request(response):
+        duration = time.perf_counter() - g.get("request_start", time.perf_counter())
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        METRICS.observe("hazard_http_request_seconds", duration, {"endpoint": endpoint})
+        status = response.status_code
+        # 4xx are the client's problem and sampled like successes; 503 is load shedding
+        level = logging.WARNING if status == 503 else logging.ERROR if status >= 500 else logging.INFO
+        logger.log(level, f"{request.method} {request.path} {status}", extra={
+            "method": request.method,
+            "path": request.path,
+            "endpoint": endpoint,
+            "status": status,
+            "duration_ms": round(duration * 1000, 2),
+            "bytes": response.content_length,
+            "remote": request.remote_addr,
+            "sample_rate": app.config["LOG_SAMPLE_RATE"],
+        })
+        return response
+
+    return app
 
 # ----------------- Helpers -------------------
 def allowed_file(filename: str) -> bool:
@@ -61,212 +154,405 @@ def clear_folder(folder_path: str):
             try:
                 os.remove(file_path)
             except Exception as e:
-                print(f"⚠️ Could not delete {file_path}: {e}")
+                logger.warning(f"⚠️ Could not delete {file_path}: {e}")
 
-def save_detection_metadata(filename: str, lat: float, lon: float, stats: dict):
+def parse_coordinates(form):
+    """Return (lat, lon) floats from form data, or (None, None)"""
+    try:
+        return float(form["lat"]), float(form["lon"])
+    except (KeyError, TypeError, ValueError):
+        return None, None
+
+def parse_inference_options(form) -> dict:
+    """
+    Optional per-job inference settings: imgsz ('auto' or int), tiled,
+    latency_budget_ms, roi ('auto', top fraction or JSON polygon), camera_profile,
+    thumbnail_mode ('confidence' | 'area'), thumbnail_format ('jpg' | 'webp')
+    """
+    options = {}
+    imgsz = form.get("imgsz")
+    if imgsz:
+        options["imgsz"] = "auto" if imgsz == "auto" else int(imgsz)
+    if form.get("tiled", "").lower() in ("1", "true", "yes"):
+        options["tiled"] = True
+    if form.get("latency_budget_ms"):
+        options["latency_budget_ms"] = float(form["latency_budget_ms"])
+    if form.get("roi"):
+        options["road_roi"] = parse_roi(form["roi"])
+    if form.get("camera_profile"):
+        options["camera_profile"] = secure_filename(form["camera_profile"])
+    if form.get("thumbnail_mode"):
+        if form["thumbnail_mode"] not in THUMBNAIL_MODES:
+            raise ValueError(f"Invalid thumbnail_mode: {form['thumbnail_mode']}")
+        options["thumbnail_mode"] = form["thumbnail_mode"]
+    if form.get("thumbnail_format"):
+        if form["thumbnail_format"] not in THUMBNAIL_FORMATS:
+            raise ValueError(f"Invalid thumbnail_format: {form['thumbnail_format']}")
+        options["thumbnail_format"] = form["thumbnail_format"]
+    return options
+
+def save_detection_metadata(filename: str, lat: float, lon: float, stats: dict, **extra):
     """Save detection metadata"""
-    metadata_file = os.path.join(DATA_DIR, "detections.json")
-    
-    detection_data = {
-        "filename": filename,
-        "start_latitude": lat,
-        "start_longitude": lon,
-        "timestamp": datetime.utcnow().isoformat(),
-        "statistics": stats
-    }
+    detection_data = build_detection_record(filename, lat, lon, stats, **extra)
+    append_detections(DATA_DIR, [detection_data])
     
-    if os.path.exists(metadata_file):
-        with open(metadata_file, 'r') as f:
-            try:
-                detections = json.load(f)
-            except json.JSONDecodeError:
-                detections = []
-    else:
-        detections = []
-    
-    detections.append(detection_data)
-    
-    with open(metadata_file, 'w') as f:
-        json.dump(detections, f, indent=2)
-    
-    print(f"✅ Saved metadata")
+    logger.debug("✅ Saved metadata", extra={"video": filename})
     return detection_data
 
+def run_detection_job(job):
+    """
+    JobManager target for /jobs: everything comes from job.params and the
+    job folder, so a job left unfinished by a restart can be run again.
+    Checkpointed at HLS segment boundaries; a rerun continues from there.
+    """
+    params = job.params
+    inference_options = {k: v for k, v in params.items() if k not in ("filename", "lat", "lon")}
+    if isinstance(inference_options.get("road_roi"), dict):
+        inference_options["road_roi"] = RoadROI.from_dict(inference_options["road_roi"])
+    lat, lon = params.get("lat"), params.get("lon")
+    stats = process_video_unified(
+        source_path=os.path.join(job.dir, params["filename"]),
+        output_path=job.output_path,
+        start_lat=lat,
+        start_lon=lon,
+        end_lat=lat,
+        end_lon=lon,
+        conf=0.25,
+        use_gpu=True,
+        stream_dir=job.stream_dir,
+        checkpoint_dir=job.checkpoint_dir,
+        thumbnails_dir=job.thumbnails_dir,
+        progress_callback=job.report_progress,
+        **inference_options
+    )
+    if lat is not None and lon is not None:
+        # Keyed by job, so a rerun after a crash replaces instead of duplicating
+        save_detection_metadata(params["filename"], lat, lon, stats, input_key=f"job:{job.id}")
+    return stats
+
+def resume_jobs():
+    """Pick up jobs a previous server process left queued/running (call once per worker)"""
+    return job_manager.resume_unfinished(run_detection_job, slots=inference_slots)
+
+def busy_response():
+    """503 while every inference slot on this host is taken"""
+    METRICS.inc("hazard_requests_rejected_total")
+    response = jsonify({"error": "Server busy: too many videos processing, retry later",
+                        "retry_after": RETRY_AFTER_SECONDS})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+    return response
+
 # ----------------- Routes --------------------
-@app.route("/")
+@api.route("/")
 def index():
     return jsonify({
         "status": "online",
         "message": "Pothole Detection API",
         "endpoints": {
             "/detect": "POST - Upload video",
+            "/jobs": "POST - Upload video, process in background",
+            "/jobs/<id>": "GET - Job status",
+            "/jobs/<id>/events": "GET - Server-Sent Events with job progress",
+            "/jobs/<id>/stream/index.m3u8": "GET - Live HLS stream of processed video",
+            "/jobs/<id>/video": "GET - Finished video (supports Range)",
+            "/jobs/<id>/thumbnails": "GET - Best crop per pothole track (index)",
+            "/jobs/<id>/thumbnails/<track_id>": "GET - Thumbnail image of one track",
+            "/live": "POST - Start live detection on RTSP/HTTP/device source",
+            "/live/<id>/events": "GET - Server-Sent Events with per-frame detections",
+            "/live/<id>/stop": "POST - Stop live detection",
             "/detections": "GET - Get all detections",
-            "/stats": "GET - Get statistics"
+            "/stats": "GET - Get statistics",
+            "/metrics": "GET - Prometheus metrics",
+            "/camera_profiles": "GET - Stored road ROI per camera"
         }
     })
 
-@app.route("/detect", methods=["POST", "OPTIONS"])
+@api.route("/detect", methods=["POST", "OPTIONS"])
 def detect_route():
     # Handle preflight OPTIONS request
     if request.method == "OPTIONS":
         return jsonify({"status": "ok"}), 200
     
-    print("\n" + "="*60)
-    print("🔍 NEW DETECTION REQUEST")
-    print("="*60)
-    print(f"Method: {request.method}")
-    print(f"Content-Type: {request.content_type}")
-    print(f"Content-Length: {request.content_length}")
-    print(f"Files keys: {list(request.files.keys())}")
-    print(f"Form keys: {list(request.form.keys())}")
-    print(f"Origin: {request.headers.get('Origin', 'Not set')}")
+    logger.debug("🔍 New detection request", extra={
+        "content_type": request.content_type,
+        "content_length": request.content_length,
+        "origin": request.headers.get("Origin"),
+    })
     
     # Validate file exists
     if "video" not in request.files:
-        print("❌ ERROR: No 'video' key in request.files")
-        print(f"   Available keys: {list(request.files.keys())}")
+        logger.info("❌ No 'video' key in request.files", extra={"keys": list(request.files.keys())})
         return jsonify({"error": "No video file. Use form key 'video'"}), 400
 
     file = request.files["video"]
-    print(f"\n📹 FILE DETAILS:")
-    print(f"   Object: {file}")
-    print(f"   Filename: '{file.filename}'")
-    print(f"   Content-Type: {file.content_type}")
-    print(f"   Content-Length: {file.content_length}")
 
     if not file.filename or file.filename == "":
-        print("❌ ERROR: Empty filename")
         return jsonify({"error": "Empty filename"}), 400
 
     if not allowed_file(file.filename):
-        print(f"❌ ERROR: Unsupported file type")
-        print(f"   Extension: {os.path.splitext(file.filename)[1]}")
-        print(f"   Allowed: {ALLOWED_EXTENSIONS}")
+        logger.info("❌ Unsupported file type", extra={"extension": os.path.splitext(file.filename)[1]})
         return jsonify({"error": f"Unsupported file type. Allowed: {ALLOWED_EXTENSIONS}"}), 400
 
     # Extract coordinates
-    lat = request.form.get("lat")
-    lon = request.form.get("lon")
-    
-    if not lat or not lon:
-        print("⚠️  No coordinates provided")
-        lat, lon = None, None
-    else:
+    lat, lon = parse_coordinates(request.form)
+
+    slot = inference_slots.try_acquire()
+    if slot is None:
+        return busy_response()
+
+    with slot:
+        # Save file
+        filename = secure_filename(file.filename)
+        upload_path = os.path.join(UPLOAD_DIR, filename)
+        
+        # Clear old files
+        clear_folder(UPLOAD_DIR)
+        clear_folder(RESULTS_DIR)
+
+        # Save the uploaded file
         try:
-            lat = float(lat)
-            lon = float(lon)
-            print(f"📍 Coordinates: ({lat}, {lon})")
-        except ValueError:
-            print("⚠️  Invalid coordinate format")
-            lat, lon = None, None
-
-    # Save file
-    filename = secure_filename(file.filename)
-    upload_path = os.path.join(UPLOAD_DIR, filename)
-    
-    print(f"\n💾 SAVING FILE:")
-    print(f"   Secure filename: {filename}")
-    print(f"   Upload path: {upload_path}")
-    
-    # Clear old files
-    print(f"🗑️  Clearing old files...")
-    clear_folder(UPLOAD_DIR)
-    clear_folder(RESULTS_DIR)
+            file.save(upload_path)
+            
+            # Verify file was saved
+            if not os.path.exists(upload_path):
+                raise FileNotFoundError(f"File not found after save: {upload_path}")
+            
+            logger.info("💾 Upload saved", extra={
+                "video": filename, "size_mb": round(os.path.getsize(upload_path) / (1024*1024), 2),
+                "lat": lat, "lon": lon
+            })
+            
+        except Exception as e:
+            logger.exception("❌ Failed to save upload", extra={"video": filename})
+            return jsonify({"error": f"Failed to save file: {str(e)}"}), 500
+
+        # Process video
+        try:
+            output_path = os.path.join(RESULTS_DIR, f"processed_{filename}")
+            
+            stats = process_video_unified(
+                source_path=upload_path,
+                output_path=output_path,
+                start_lat=lat,
+                start_lon=lon,
+                end_lat=lat,
+                end_lon=lon,
+                conf=0.25,  # 🎯 High sensitivity for best detection
+                use_gpu=True  # 🚀 GPU acceleration (10x faster, no accuracy loss)
+            )
+            
+            logger.info("✅ Processing complete", extra={
+                "video": filename,
+                "potholes": stats["total_potholes"],
+                "processing_time_s": round(stats["processing_time"], 1),
+                "fps": round(stats["processing_fps"], 1),
+            })
+
+            # Save metadata
+            if lat is not None and lon is not None:
+                save_detection_metadata(filename, lat, lon, stats)
+
+            # Verify output exists
+            if not os.path.exists(output_path):
+                raise FileNotFoundError(f"Output video not created: {output_path}")
+            
+            return send_file(output_path, mimetype="video/mp4")
+
+        except Exception as e:
+            logger.exception("❌ Error during processing", extra={"video": filename})
+            return jsonify({"error": str(e)}), 500
 
-    # Save the uploaded file
+@api.route("/jobs", methods=["POST"])
+def create_job():
+    """Start background processing; output is streamed as HLS while it runs"""
+    file = request.files.get("video")
+    if file is None or not file.filename:
+        return jsonify({"error": "No video file. Use form key 'video'"}), 400
+    if not allowed_file(file.filename):
+        return jsonify({"error": f"Unsupported file type. Allowed: {ALLOWED_EXTENSIONS}"}), 400
+
+    lat, lon = parse_coordinates(request.form)
     try:
-        print(f"   Saving to disk...")
-        file.save(upload_path)
-        
-        # Verify file was saved
-        if not os.path.exists(upload_path):
-            raise FileNotFoundError(f"File not found after save: {upload_path}")
-        
-        file_size = os.path.getsize(upload_path)
-        print(f"✅ File saved successfully!")
-        print(f"   Size on disk: {file_size / (1024*1024):.2f} MB")
-        print(f"   Path exists: {os.path.exists(upload_path)}")
-        print(f"   Is file: {os.path.isfile(upload_path)}")
-        
-    except Exception as e:
-        print(f"❌ ERROR saving file: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": f"Failed to save file: {str(e)}"}), 500
+        inference_options = parse_inference_options(request.form)
+    except ValueError:
+        return jsonify({"error": "Invalid imgsz / latency_budget_ms / roi / thumbnail option"}), 400
 
-    # Process video
+    # Held until the job finishes; refuse instead of queueing without bound
+    slot = inference_slots.try_acquire()
+    if slot is None:
+        return busy_response()
+    filename = secure_filename(file.filename)
+    job = job_manager.create({
+        "filename": filename, "lat": lat, "lon": lon,
+        **{k: (v.to_dict() if hasattr(v, "to_dict") else v) for k, v in inference_options.items()}
+    })
     try:
-        print(f"\n🚀 STARTING VIDEO PROCESSING")
-        output_path = os.path.join(RESULTS_DIR, f"processed_{filename}")
-        
-        stats = process_video_unified(
-            source_path=upload_path,
-            output_path=output_path,
-            start_lat=lat,
-            start_lon=lon,
-            end_lat=lat,
-            end_lon=lon,
-            conf=0.25,  # 🎯 High sensitivity for best detection
-            use_gpu=True  # 🚀 GPU acceleration (10x faster, no accuracy loss)
-        )
-        
-        print(f"\n✅ PROCESSING COMPLETE")
-        print(f"   Potholes: {stats['total_potholes']}")
-        print(f"   Time: {stats['processing_time']:.1f}s")
-        print(f"   Speed: {stats['processing_fps']:.1f} fps")
-
-        # Save metadata
-        if lat is not None and lon is not None:
-            save_detection_metadata(filename, lat, lon, stats)
-
-        # Verify output exists
-        if not os.path.exists(output_path):
-            raise FileNotFoundError(f"Output video not created: {output_path}")
-        
-        print(f"   Output size: {os.path.getsize(output_path) / (1024*1024):.2f} MB")
-        print(f"\n📤 SENDING FILE TO CLIENT")
-        
-        return send_file(output_path, mimetype="video/mp4")
+        file.save(os.path.join(job.dir, filename))
+    except Exception:
+        slot.release()
+        raise
+
+    job_manager.submit(job, run_detection_job, slot=slot)
+    logger.info(f"🚀 Queued job {job.id}", extra={"job": job.id, "video": filename})
+
+    return jsonify({
+        **job.to_dict(),
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+        "stream_url": f"/jobs/{job.id}/stream/{HLS_PLAYLIST}",
+        "video_url": f"/jobs/{job.id}/video",
+        "thumbnails_url": f"/jobs/{job.id}/thumbnails",
+    }), 202
+
+@api.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
+@api.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """
+    SSE: 'progress' events while running, then 'done' or 'failed'.
+    Jobs run by another worker process send one snapshot event and close.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return Response(
+        stream_with_context(job.channel.subscribe()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api.route("/jobs/<job_id>/stream/<path:filename>", methods=["GET"])
+def stream_job(job_id, filename):
+    """Serve the HLS playlist/segments written so far"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if not os.path.exists(os.path.join(job.stream_dir, filename)):
+        return jsonify({"error": "Stream not ready yet", "status": job.status}), 404
+
+    if filename.endswith(".m3u8"):
+        response = send_from_directory(job.stream_dir, filename, mimetype="application/vnd.apple.mpegurl")
+        # Playlist grows while the job runs
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    return send_from_directory(job.stream_dir, filename, mimetype="video/mp2t", max_age=3600)
+
+@api.route("/jobs/<job_id>/video", methods=["GET"])
+def get_job_video(job_id):
+    """Finished faststart MP4; conditional send_file answers Range requests"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job.status != "done" or not os.path.exists(job.output_path):
+        return jsonify({"error": "Video not ready", "status": job.status}), 409
+    return send_file(job.output_path, mimetype="video/mp4", conditional=True)
+
+@api.route("/jobs/<job_id>/thumbnails", methods=["GET"])
+def list_job_thumbnails(job_id):
+    """Best crop of each track written so far (grows while the job runs)"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    index = load_thumbnail_index(job.thumbnails_dir)
+    if index is None:
+        return jsonify({"error": "No thumbnails yet", "status": job.status}), 404
+    for track_id, info in index["tracks"].items():
+        info["url"] = f"/jobs/{job.id}/thumbnails/{track_id}"
+    return jsonify({**index, "status": job.status})
 
-    except Exception as e:
-        print(f"\n❌ ERROR DURING PROCESSING:")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
+@api.route("/jobs/<job_id>/thumbnails/<int:track_id>", methods=["GET"])
+def get_job_thumbnail(job_id, track_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    index = load_thumbnail_index(job.thumbnails_dir)
+    info = (index or {}).get("tracks", {}).get(str(track_id))
+    if info is None:
+        return jsonify({"error": "Unknown track"}), 404
+    # A track's best crop can still improve until the job is done
+    max_age = 86400 if job.status == "done" else 0
+    return send_from_directory(job.thumbnails_dir, info["file"], mimetype=THUMBNAIL_MIMETYPES[index["format"]],
+                               max_age=max_age)
 
-@app.route("/detections", methods=["GET"])
+@api.route("/live", methods=["GET", "POST"])
+def live_route():
+    if request.method == "GET":
+        return jsonify([session.to_dict() for session in list(live_sessions.values())])
+
+    body = request.get_json(silent=True) or request.form
+    source = body.get("source")
+    if source is None or str(source).strip() == "":
+        return jsonify({"error": "Missing 'source' (rtsp://, http://, device index or uploaded file name)"}), 400
+
+    source = parse_source(source)
+    if isinstance(source, str) and "://" not in source:
+        # Local files (fake live stream for testing) only from the upload folder
+        source = os.path.join(UPLOAD_DIR, secure_filename(source))
+        if not os.path.isfile(source):
+            return jsonify({"error": "File source not found in uploads"}), 404
+
+    try:
+        conf = float(body.get("conf", 0.25))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid 'conf'"}), 400
+
+    slot = inference_slots.try_acquire()
+    if slot is None:
+        return busy_response()
+
+    session = LiveSession(source, slot=slot, on_end=lambda s: live_sessions.pop(s.id, None), conf=conf, use_gpu=True)
+    live_sessions[session.id] = session
+    if session.status != "running":
+        live_sessions.pop(session.id, None)  # ended before it was registered
+    logger.info(f"📡 Started live session {session.id}", extra={"session": session.id, "source": str(source)})
+
+    return jsonify({
+        **session.to_dict(),
+        "events_url": f"/live/{session.id}/events",
+        "stop_url": f"/live/{session.id}/stop",
+    }), 201
+
+@api.route("/live/<session_id>/events", methods=["GET"])
+def live_events(session_id):
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown live session"}), 404
+    return Response(
+        stream_with_context(session.channel.subscribe()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api.route("/live/<session_id>/stop", methods=["POST"])
+def live_stop(session_id):
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown live session"}), 404
+    session.stop()
+    return jsonify(session.to_dict())
+
+@api.route("/detections", methods=["GET"])
 def get_detections():
     """Get all detection metadata"""
-    metadata_file = os.path.join(DATA_DIR, "detections.json")
-    
-    if os.path.exists(metadata_file):
-        with open(metadata_file, 'r') as f:
-            try:
-                detections = json.load(f)
-                return jsonify(detections)
-            except json.JSONDecodeError:
-                return jsonify([])
-    
-    return jsonify([])
+    return jsonify(load_detections(DATA_DIR))
 
-@app.route("/stats", methods=["GET"])
+@api.route("/stats", methods=["GET"])
 def get_overall_stats():
     """Get overall statistics"""
-    metadata_file = os.path.join(DATA_DIR, "detections.json")
-    
-    if not os.path.exists(metadata_file):
+    detections = load_detections(DATA_DIR)
+    if not detections:
         return jsonify({
             "total_videos": 0,
             "total_potholes": 0,
             "total_distance_km": 0
         })
     
-    with open(metadata_file, 'r') as f:
-        try:
-            detections = json.load(f)
-        except json.JSONDecodeError:
-            detections = []
-    
     total_potholes = sum(d.get("statistics", {}).get("total_potholes", 0) for d in detections)
     total_distance = sum(d.get("statistics", {}).get("distance_km", 0) for d in detections)
     
@@ -277,14 +563,25 @@ def get_overall_stats():
         "latest_detection": detections[-1] if detections else None
     })
 
+@api.route("/camera_profiles", methods=["GET"])
+def get_camera_profiles():
+    return jsonify(load_camera_profiles(DATA_DIR))
+
+@api.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus scrape endpoint: stage latency histograms, fps, queue depths, RSS"""
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
 # ----------------- Main ----------------------
 if __name__ == "__main__":
-    print("\n" + "="*60)
-    print("🚀 Pothole Detection API Starting")
-    print("="*60)
-    print(f"Upload dir: {UPLOAD_DIR}")
-    print(f"Results dir: {RESULTS_DIR}")
-    print(f"Data dir: {DATA_DIR}")
-    print("="*60 + "\n")
-    
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    # Development server; production runs `gunicorn -c gunicorn.conf.py wsgi:app`
+    app = create_app({"LOG_FORMAT": os.environ.get("LOG_FORMAT", "text")})
+    # With the debug reloader, only the serving child runs jobs
+    if os.environ.get("FLASK_DEBUG") != "1" or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        resume_jobs()
+    logger.info("🚀 Pothole Detection API starting", extra={
+        "upload_dir": UPLOAD_DIR, "results_dir": RESULTS_DIR, "data_dir": DATA_DIR,
+        "max_inference_jobs": MAX_INFERENCE_JOBS
+    })
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)),
+            debug=os.environ.get("FLASK_DEBUG") == "1")
\ No newline at end of file
@@ -0,0 +1,278 @@
+"""
+Batch pothole detection for archive backfills.
+
+    python batch_process.py /archive/2025-10 /archive/2025-11 --workers 2
+    python batch_process.py manifest.csv --output-dir static/results/batch
+
+Inputs are directories (scanned for videos) and/or manifests:
+  .csv   columns: path,lat,lon[,end_lat,end_lon]
+  .json  list of {"path": ..., "lat": ..., "lon": ...}
+  .txt   one video path per line
+
+Videos are processed across a process pool (one YOLO load per worker).
+Progress is checkpointed to a state file after every finished video, and
+inputs already done (same path, size and mtime) are skipped, so re-running
+the same command after a crash resumes where it stopped. Long videos are
+also checkpointed inside (every --checkpoint-every frames), so an
+interrupted video continues from its last checkpoint instead of frame 0.
+Results go straight into data/detections.json.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+from utils.checkpoint import DEFAULT_CHECKPOINT_INTERVAL
+from utils.detection_store import append_detections, build_detection_record
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm"}
+DATA_DIR = os.path.join(BASE_DIR, "data")
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, "static", "results", "batch")
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger("batch_process")
+
+
+# ----------------- Inputs --------------------
+def _float_or_none(value):
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _entry(path: str, base_dir: str, coords: Dict = None) -> Dict:
+    path = path if os.path.isabs(path) else os.path.join(base_dir, path)
+    entry = {"path": os.path.abspath(path)}
+    for key in ("lat", "lon", "end_lat", "end_lon"):
+        entry[key] = _float_or_none((coords or {}).get(key))
+    return entry
+
+
+def read_manifest(path: str) -> List[Dict]:
+    """Relative video paths in a manifest are relative to the manifest itself"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, newline="") as f:
+        if ext == ".csv":
+            return [_entry(row["path"], base_dir, row) for row in csv.DictReader(f) if row.get("path")]
+        if ext == ".json":
+            return [_entry(item["path"], base_dir, item) for item in json.load(f)]
+        return [_entry(line.strip(), base_dir) for line in f if line.strip() and not line.startswith("#")]
+
+
+def collect_inputs(sources: List[str], recursive: bool = True) -> List[Dict]:
+    entries = []
+    for source in sources:
+        source = os.path.abspath(source)
+        if os.path.isdir(source):
+            walker = os.walk(source) if recursive else [(source, [], os.listdir(source))]
+            for root, _, files in walker:
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS:
+                        entries.append(_entry(os.path.join(root, name), root))
+        elif os.path.splitext(source)[1].lower() in VIDEO_EXTENSIONS:
+            entries.append(_entry(source, os.getcwd()))
+        elif os.path.isfile(source):
+            entries.extend(read_manifest(source))
+        else:
+            logger.warning(f"⚠️  Skipping unknown input: {source}")
+    # De-duplicate, keep first occurrence (manifest coordinates win over bare paths)
+    seen, unique = set(), []
+    for entry in sorted(entries, key=lambda e: e["path"]):
+        if entry["path"] not in seen:
+            seen.add(entry["path"])
+            unique.append(entry)
+    return unique
+
+
+def input_key(path: str) -> str:
+    """Identity of an input file: path + size + mtime (cheap, no full-file hash)"""
+    stat = os.stat(path)
+    return f"{path}|{stat.st_size}|{int(stat.st_mtime)}"
+
+
+def _output_name(path: str) -> str:
+    digest = hashlib.sha1(path.encode()).hexdigest()[:8]
+    return f"{os.path.splitext(os.path.basename(path))[0]}_{digest}"
+
+
+def output_path_for(path: str, output_dir: str) -> str:
+    return os.path.join(output_dir, f"processed_{_output_name(path)}.mp4")
+
+
+def checkpoint_dir_for(path: str, output_dir: str) -> str:
+    return os.path.join(output_dir, "checkpoints", _output_name(path))
+
+
+def thumbnails_dir_for(path: str, output_dir: str) -> str:
+    return os.path.join(output_dir, "thumbnails", _output_name(path))
+
+
+# ----------------- Checkpoint ----------------
+class BatchState:
+    """{input_key: {"status", "output", "finished", "error"}} persisted after every video"""
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                try:
+                    self.entries = json.load(f)
+                except json.JSONDecodeError:
+                    logger.warning(f"⚠️  Corrupt state file, starting fresh: {path}")
+
+    def is_done(self, key: str) -> bool:
+        return self.entries.get(key, {}).get("status") == "done"
+
+    def mark(self, key: str, **info):
+        self.entries[key] = dict(info, updated=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+# ----------------- Workers -------------------
+def _init_worker(use_gpu: bool):
+    """Runs once per worker process: load the model a single time"""
+    if not use_gpu:
+        os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    os.chdir(BASE_DIR)  # model/best.pt is resolved relative to the backend folder
+    import utils.unified_detection  # noqa: F401  (loads YOLO + cascades)
+
+
+def _process_one(entry: Dict, output_path: str, options: Dict) -> Dict:
+    from utils.unified_detection import process_video_unified
+    return process_video_unified(
+        source_path=entry["path"],
+        output_path=output_path,
+        start_lat=entry["lat"],
+        start_lon=entry["lon"],
+        end_lat=entry["end_lat"] if entry["end_lat"] is not None else entry["lat"],
+        end_lon=entry["end_lon"] if entry["end_lon"] is not None else entry["lon"],
+        **options
+    )
+
+
+def run_batch(entries: List[Dict], output_dir: str, state: BatchState, workers: int, options: Dict,
+              use_gpu: bool, data_dir: str = DATA_DIR) -> Dict:
+    # Workers chdir to the backend folder, so every path handed to them must be absolute
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    pending = []
+    for entry in entries:
+        if not os.path.exists(entry["path"]):
+            logger.warning(f"⚠️  Missing input: {entry['path']}")
+            continue
+        key = input_key(entry["path"])
+        if state.is_done(key):
+            continue
+        pending.append((key, entry))
+
+    summary = {"total": len(entries), "skipped": len(entries) - len(pending), "done": 0, "failed": 0}
+    logger.info(f"📦 {len(pending)} to process, {summary['skipped']} already done or missing")
+    if not pending:
+        return summary
+
+    # spawn: CUDA cannot be re-initialised in forked children
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(use_gpu,)) as pool:
+        futures = {}
+        for key, entry in pending:
+            output_path = output_path_for(entry["path"], output_dir)
+            entry_options = dict(options)
+            if entry_options.pop("checkpoint", False):
+                entry_options["checkpoint_dir"] = checkpoint_dir_for(entry["path"], output_dir)
+            if entry_options.pop("thumbnails", False):
+                entry_options["thumbnails_dir"] = thumbnails_dir_for(entry["path"], output_dir)
+            futures[pool.submit(_process_one, entry, output_path, entry_options)] = (key, entry, output_path)
+
+        for future in as_completed(futures):
+            key, entry, output_path = futures[future]
+            try:
+                stats = future.result()
+            except BrokenProcessPool as e:
+                # Worker died (OOM, segfault): leave unrecorded so the next run retries it
+                summary["failed"] += 1
+                logger.error(f"❌ {entry['path']}: worker crashed ({e})")
+                continue
+            except Exception as e:
+                summary["failed"] += 1
+                logger.error(f"❌ {entry['path']}: {e}")
+                state.mark(key, status="failed", error=str(e))
+                continue
+            append_detections(data_dir, [build_detection_record(
+                os.path.basename(entry["path"]), entry["lat"], entry["lon"], stats,
+                source_path=entry["path"], input_key=key, batch=True
+            )])
+            state.mark(key, status="done", output=output_path, potholes=stats["total_potholes"])
+            summary["done"] += 1
+            logger.info(f"✅ [{summary['done'] + summary['failed']}/{len(pending)}] {entry['path']}: "
+                        f"{stats['total_potholes']} potholes, {stats['processing_fps']:.1f} fps")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="video files, directories or manifests (.csv/.json/.txt)")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--state-file", default=None, help="default: <output-dir>/batch_state.json")
+    parser.add_argument("--workers", type=int, default=1, help="processes (each loads its own model)")
+    parser.add_argument("--no-recursive", action="store_true")
+    parser.add_argument("--cpu", action="store_true", help="force CPU inference")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--imgsz", default="640", help="int or 'auto'")
+    parser.add_argument("--output-max-height", type=int, default=None)
+    parser.add_argument("--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_INTERVAL,
+                        help="frames between in-video checkpoints (0 disables)")
+    parser.add_argument("--thumbnails", choices=["confidence", "area", "off"], default="confidence",
+                        help="save the best crop per pothole track, picked by confidence or box area")
+    parser.add_argument("--thumbnail-format", choices=["jpg", "webp"], default="jpg")
+    parser.add_argument("--retry-failed", action="store_true", help="also re-run inputs that failed before")
+    args = parser.parse_args()
+    # Resolve against the caller's cwd, not the workers' (they run from the backend folder)
+    args.output_dir = os.path.abspath(args.output_dir)
+    args.state_file = os.path.abspath(args.state_file or os.path.join(args.output_dir, "batch_state.json"))
+
+    entries = collect_inputs(args.inputs, recursive=not args.no_recursive)
+    state = BatchState(args.state_file)
+    if not args.retry_failed:
+        # Failed inputs stay failed until explicitly retried
+        failed = {k for k, v in state.entries.items() if v.get("status") == "failed"}
+        entries = [e for e in entries if not os.path.exists(e["path"]) or input_key(e["path"]) not in failed]
+
+    options = {
+        "conf": args.conf,
+        "use_gpu": not args.cpu,
+        "imgsz": args.imgsz if args.imgsz == "auto" else int(args.imgsz),
+        "output_max_height": args.output_max_height,
+        "checkpoint": args.checkpoint_every > 0,
+        "thumbnails": args.thumbnails != "off",
+    }
+    if args.thumbnails != "off":
+        options["thumbnail_mode"] = args.thumbnails
+        options["thumbnail_format"] = args.thumbnail_format
+    if args.checkpoint_every > 0:
+        options["checkpoint_interval"] = args.checkpoint_every
+    os.makedirs(args.output_dir, exist_ok=True)
+    start = time.time()
+    summary = run_batch(entries, args.output_dir, state, max(1, args.workers), options, use_gpu=not args.cpu)
+    logger.info(f"🏁 Batch finished in {time.time() - start:.0f}s: {summary}")
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Decode + encode throughput of each video I/O backend vs the OpenCV baseline.
+
+    python benchmarks/bench_video_io.py video4.mp4 --max-height 720 --json io.json
+
+Only I/O is measured (no YOLO), so the numbers isolate codec cost.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.video_io import available_backends, open_video_reader, open_video_writer, DEFAULT_PRESET, DEFAULT_CRF
+
+
+def bench_backend(source: str, backend: str, out_dir: str, preset: str, crf: int, max_height: int = None) -> dict:
+    output_path = os.path.join(out_dir, f"bench_{backend}.mp4")
+    frames = 0
+    decode_time = 0.0
+    encode_time = 0.0
+
+    start = time.perf_counter()
+    reader = open_video_reader(source, backend=backend)
+    writer = open_video_writer(output_path, reader.fps, (reader.width, reader.height), backend=backend,
+                               preset=preset, crf=crf, max_height=max_height)
+    try:
+        while True:
+            t0 = time.perf_counter()
+            ret, frame = reader.read()
+            t1 = time.perf_counter()
+            decode_time += t1 - t0
+            if not ret:
+                break
+            writer.write(frame)
+            encode_time += time.perf_counter() - t1
+            frames += 1
+    finally:
+        reader.release()
+        t0 = time.perf_counter()
+        writer.release()
+        encode_time += time.perf_counter() - t0
+    total = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "frames": frames,
+        "resolution": f"{reader.width}x{reader.height}",
+        "total_seconds": round(total, 3),
+        "fps": round(frames / total, 1) if total > 0 else 0,
+        "decode_fps": round(frames / decode_time, 1) if decode_time > 0 else 0,
+        "encode_fps": round(frames / encode_time, 1) if encode_time > 0 else 0,
+        "output_bytes": os.path.getsize(output_path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", nargs="?", default="video4.mp4")
+    parser.add_argument("--backends", nargs="*", default=None, help="default: all available")
+    parser.add_argument("--preset", default=DEFAULT_PRESET)
+    parser.add_argument("--crf", type=int, default=DEFAULT_CRF)
+    parser.add_argument("--max-height", type=int, default=None)
+    parser.add_argument("--json", dest="json_path", default=None, help="write results to this file")
+    args = parser.parse_args()
+
+    backends = args.backends or available_backends()
+    results = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for backend in backends:
+            result = bench_backend(args.source, backend, out_dir, args.preset, args.crf, args.max_height)
+            results.append(result)
+            print(f"{backend:>7}: {result['fps']:7.1f} fps "
+                  f"(decode {result['decode_fps']:.1f}, encode {result['encode_fps']:.1f}) | "
+                  f"{result['output_bytes'] / 1024:.0f} KB")
+
+    baseline = next((r for r in results if r["backend"] == "opencv"), None)
+    if baseline:
+        for r in results:
+            if r is baseline or not baseline["fps"]:
+                continue
+            print(f"{r['backend']} vs opencv: {r['fps'] / baseline['fps']:.2f}x speed, "
+                  f"{r['output_bytes'] / max(baseline['output_bytes'], 1):.2f}x size")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+HTTP load test for the lightweight API endpoints (no video upload).
+
+Hammers a running server with concurrent keep-alive clients for a fixed
+time and reports requests/s and p50/p95/p99 latency per endpoint.
+
+    gunicorn -c gunicorn.conf.py wsgi:app &
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --concurrency 32 --duration 20
+
+Uses only the standard library, so it runs from any box next to the server.
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+DEFAULT_ENDPOINTS = ["/", "/stats", "/detections", "/camera_profiles", "/metrics", "/jobs/000000000000"]
+
+
+def percentile(ordered: list, q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def worker(url: str, endpoints: list, offset: int, deadline: float, results: dict, lock: threading.Lock):
+    """One client: a persistent connection cycling through the endpoints"""
+    parts = urlsplit(url)
+    conn_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(parts.hostname, parts.port, timeout=30)
+    local = {path: {"latencies": [], "errors": 0, "statuses": {}} for path in endpoints}
+    i = offset
+    while time.perf_counter() < deadline:
+        path = endpoints[i % len(endpoints)]
+        i += 1
+        entry = local[path]
+        start = time.perf_counter()
+        try:
+            conn.request("GET", parts.path.rstrip("/") + path)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            entry["errors"] += 1
+            conn.close()
+            conn = conn_cls(parts.hostname, parts.port, timeout=30)
+            continue
+        entry["latencies"].append(time.perf_counter() - start)
+        entry["statuses"][status] = entry["statuses"].get(status, 0) + 1
+        if status >= 500:
+            entry["errors"] += 1
+    conn.close()
+    with lock:
+        for path, entry in local.items():
+            total = results.setdefault(path, {"latencies": [], "errors": 0, "statuses": {}})
+            total["latencies"] += entry["latencies"]
+            total["errors"] += entry["errors"]
+            for status, count in entry["statuses"].items():
+                total["statuses"][status] = total["statuses"].get(status, 0) + count
+
+
+def summarize(samples: dict, seconds: float) -> dict:
+    ordered = sorted(samples["latencies"])
+    return {
+        "requests": len(ordered),
+        "errors": samples["errors"],
+        "statuses": {str(k): v for k, v in sorted(samples["statuses"].items())},
+        "rps": round(len(ordered) / seconds, 1),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+def run_load_test(url: str, endpoints: list, concurrency: int, duration: float, warmup: float = 1.0) -> dict:
+    if warmup > 0:
+        run_load_test(url, endpoints, concurrency, warmup, warmup=0)
+    results, lock = {}, threading.Lock()
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(url, endpoints, n, deadline, results, lock), daemon=True)
+               for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    combined = {"latencies": [], "errors": 0, "statuses": {}}
+    for samples in results.values():
+        combined["latencies"] += samples["latencies"]
+        combined["errors"] += samples["errors"]
+        for status, count in samples["statuses"].items():
+            combined["statuses"][status] = combined["statuses"].get(status, 0) + count
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "duration_s": round(seconds, 2),
+        "endpoints": {path: summarize(results[path], seconds) for path in endpoints if path in results},
+        "total": summarize(combined, seconds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--endpoints", nargs="*", default=DEFAULT_ENDPOINTS)
+    parser.add_argument("--output", default=None, help="write the report as JSON")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="exit 1 if overall p99 exceeds this")
+    args = parser.parse_args()
+
+    report = run_load_test(args.url, args.endpoints, args.concurrency, args.duration, args.warmup)
+
+    print(f"{'endpoint':<25} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for path, row in list(report["endpoints"].items()) + [("TOTAL", report["total"])]:
+        print(f"{path:<25} {row['rps']:>9.1f} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+              f"{row['p99_ms']:>9.2f} {row['errors']:>7}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    if args.max_p99_ms is not None and report["total"]["p99_ms"] > args.max_p99_ms:
+        print(f"❌ p99 {report['total']['p99_ms']} ms > {args.max_p99_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+End-to-end benchmark suite for the detection pipeline (CPU-only, offline).
+
+Runs process_video_unified, the privacy_blur service and PotholeTracker on
+synthetic road clips (several resolutions/lengths) and the bundled
+video4.mp4. Records fps, per-stage latency, peak RSS and output size to
+JSON and compares them with a stored baseline. A regression beyond the
+tolerance exits non-zero, and so does a missing baseline (unless
+--allow-missing-baseline), so a CI job cannot pass without comparing.
+
+    python benchmarks/run_benchmarks.py                    # run + compare
+    python benchmarks/run_benchmarks.py --quick            # smallest matrix
+    python benchmarks/run_benchmarks.py --update-baseline  # accept current numbers
+
+Every case runs in a fresh spawned process, so peak RSS belongs to that case
+only and the model load is not counted in fps.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import multiprocessing
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(BACKEND_DIR)
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results.json")
+BUNDLED_CLIP = os.path.join(BACKEND_DIR, "video4.mp4")
+
+# (width, height, frames)
+SYNTHETIC_CLIPS = [(640, 360, 90), (1280, 720, 90), (1920, 1080, 60), (1280, 720, 300)]
+QUICK_CLIPS = [(640, 360, 60)]
+TRACKER_FRAMES = 5000
+
+# Allowed relative change before a metric counts as a regression
+DEFAULT_TOLERANCE = {"fps": 0.20, "peak_rss_mb": 0.25, "output_bytes": 0.15}
+
+
+def _force_cpu_offline():
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    os.environ["YOLO_OFFLINE"] = "True"
+
+
+def make_synthetic_clip(path: str, width: int, height: int, frames: int, fps: float = 30.0, seed: int = 0) -> str:
+    """Deterministic dashcam-like clip: sky, asphalt and dark patches moving towards the camera"""
+    import cv2
+    import numpy as np
+    from utils.video_io import open_video_writer
+
+    rng = np.random.default_rng(seed)
+    horizon = int(height * 0.45)
+    base = np.empty((height, width, 3), np.uint8)
+    base[:horizon] = (200, 170, 130)
+    base[horizon:] = (90, 90, 90)
+    noise = rng.integers(0, 25, (height - horizon, width, 1), dtype=np.uint8)
+    base[horizon:] += noise
+    cv2.line(base, (width // 2, horizon), (width // 2, height), (230, 230, 230), max(2, width // 200))
+
+    patches = [(rng.uniform(0.2, 0.8), rng.uniform(0, 1)) for _ in range(4)]
+    writer = open_video_writer(path, fps, (width, height), backend="opencv")
+    try:
+        for i in range(frames):
+            frame = base.copy()
+            for x_frac, phase in patches:
+                progress = (phase + i / max(frames, 1)) % 1.0
+                y = int(horizon + progress * (height - horizon))
+                rx = max(3, int(width * 0.06 * (0.3 + progress)))
+                ry = max(2, rx // 3)
+                cv2.ellipse(frame, (int(x_frac * width), y), (rx, ry), 0, 0, 360, (35, 35, 40), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def _case_result(name: str, kind: str, frames: int, seconds: float, **extra) -> dict:
+    from utils.metrics import peak_rss_bytes
+    result = {
+        "case": name,
+        "kind": kind,
+        "frames": frames,
+        "seconds": round(seconds, 3),
+        "fps": round(frames / seconds, 2) if seconds > 0 else 0,
+        "peak_rss_mb": round(peak_rss_bytes() / 1024**2, 1),
+    }
+    result.update(extra)
+    return result
+
+
+def bench_pipeline(name: str, clip: str, out_dir: str) -> dict:
+    from utils.unified_detection import process_video_unified, MODEL_LOAD_SECONDS
+    output_path = os.path.join(out_dir, f"{name}.mp4")
+    stats = process_video_unified(clip, output_path, conf=0.25, use_gpu=False)
+    return _case_result(
+        name, "pipeline", stats["total_frames"], stats["processing_time"],
+        output_bytes=stats["output_size_bytes"],
+        potholes=stats["total_potholes"],
+        stage_timings=stats["stage_timings"],
+        model_load_seconds=round(MODEL_LOAD_SECONDS, 3),
+    )
+
+
+def bench_privacy_blur(name: str, clip: str, out_dir: str) -> dict:
+    import cv2
+    from privacy_blur.service import apply_blur
+    cap = cv2.VideoCapture(clip)
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    start = time.perf_counter()
+    final_out = apply_blur(clip, output_dir=os.path.join(out_dir, name))
+    seconds = time.perf_counter() - start
+    # apply_blur makes two full passes (faces, then plates)
+    return _case_result(name, "privacy_blur", frames, seconds, output_bytes=os.path.getsize(final_out))
+
+
+def bench_tracker(name: str, frames: int = TRACKER_FRAMES, seed: int = 0) -> dict:
+    import numpy as np
+    from utils.tracking import FrameDetections, PotholeTracker
+    rng = np.random.default_rng(seed)
+    boxes = []
+    for _ in range(frames):
+        n = int(rng.integers(0, 8))
+        xy = rng.integers(0, 1800, (n, 2))
+        wh = rng.integers(20, 200, (n, 2))
+        boxes.append(FrameDetections(np.hstack([xy, xy + wh]), rng.uniform(0.25, 1.0, n)))
+    tracker = PotholeTracker()
+    start = time.perf_counter()
+    for detections in boxes:
+        tracker.update(detections)
+    seconds = time.perf_counter() - start
+    return _case_result(name, "tracker", frames, seconds, potholes=tracker.get_total_count())
+
+
+def _run_case(case: dict) -> dict:
+    """Child-process entry point"""
+    _force_cpu_offline()
+    os.chdir(BACKEND_DIR)  # model/best.pt is resolved relative to the backend folder
+    kind = case["kind"]
+    if kind == "pipeline":
+        return bench_pipeline(case["name"], case["clip"], case["out_dir"])
+    if kind == "privacy_blur":
+        return bench_privacy_blur(case["name"], case["clip"], case["out_dir"])
+    if kind == "tracker":
+        return bench_tracker(case["name"])
+    raise ValueError(f"Unknown benchmark kind: {kind}")
+
+
+def run_isolated(case: dict) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(_run_case, (case,))
+
+
+def machine_info() -> dict:
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def compare(results: list, baseline: dict, tolerance: dict) -> list:
+    """Return human-readable regressions of results vs baseline"""
+    previous = {r["case"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        base = previous.get(result["case"])
+        if base is None:
+            continue
+        if base.get("fps") and result["fps"] < base["fps"] * (1 - tolerance["fps"]):
+            regressions.append(f"{result['case']}: fps {result['fps']} < baseline {base['fps']}")
+        for metric in ("peak_rss_mb", "output_bytes"):
+            if base.get(metric) and result.get(metric, 0) > base[metric] * (1 + tolerance[metric]):
+                regressions.append(f"{result['case']}: {metric} {result[metric]} > baseline {base[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="one small synthetic clip + bundled clip")
+    parser.add_argument("--only", choices=["pipeline", "privacy_blur", "tracker"], nargs="*", default=None)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="exit 0 when there is no baseline to compare with")
+    parser.add_argument("--fps-tolerance", type=float, default=DEFAULT_TOLERANCE["fps"])
+    args = parser.parse_args()
+
+    kinds = args.only or ["pipeline", "privacy_blur", "tracker"]
+    tolerance = dict(DEFAULT_TOLERANCE, fps=args.fps_tolerance)
+
+    with tempfile.TemporaryDirectory(prefix="hazard_bench_") as work_dir:
+        clips = []
+        video_kinds = [kind for kind in ("pipeline", "privacy_blur") if kind in kinds]
+        clip_specs = (QUICK_CLIPS if args.quick else SYNTHETIC_CLIPS) if video_kinds else []
+        for width, height, frames in clip_specs:
+            name = f"synthetic_{width}x{height}_{frames}f"
+            clips.append((name, make_synthetic_clip(os.path.join(work_dir, name + ".mp4"), width, height, frames)))
+        if video_kinds and os.path.exists(BUNDLED_CLIP):
+            clips.append(("video4", BUNDLED_CLIP))
+
+        cases = []
+        for kind in video_kinds:
+            cases += [{"kind": kind, "name": f"{kind}/{name}", "clip": clip, "out_dir": work_dir}
+                      for name, clip in clips]
+        if "tracker" in kinds:
+            cases.append({"kind": "tracker", "name": f"tracker/{TRACKER_FRAMES}f"})
+
+        results = []
+        for case in cases:
+            result = run_isolated(case)
+            results.append(result)
+            print(f"{result['case']:<45} {result['fps']:8.1f} fps | "
+                  f"RSS {result['peak_rss_mb']:7.1f} MB | "
+                  f"{result.get('output_bytes', 0) / 1024:8.0f} KB")
+
+    report = {"machine": machine_info(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        if args.allow_missing_baseline:
+            return
+        sys.exit(1)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("machine") != report["machine"]:
+        print("⚠️  Baseline was recorded on a different machine; comparisons may be noisy")
+    regressions = compare(results, baseline, tolerance)
+    if regressions:
+        print("\n❌ PERFORMANCE REGRESSIONS:")
+        for line in regressions:
+            print(f"   {line}")
+        sys.exit(1)
+    print("✅ No regressions vs baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Production serving profile:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every knob can be overridden from the environment (or gunicorn's own CLI flags).
+"""
+import os
+
+# torch.cuda.is_available() through NVML, so importing the model in the master
+# (preload) does not initialise CUDA before the workers are forked
+os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+os.environ.setdefault("LOG_FORMAT", "json")
+os.environ.setdefault("LOG_SAMPLE_RATE", "0.1")
+
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+
+# Load app + YOLO weights once in the master; workers share the pages copy-on-write
+preload_app = True
+
+# Threads, not processes, carry the concurrency: SSE streams and uploads are
+# I/O-bound, inference is capped host-wide by HAZARD_MAX_INFERENCE_JOBS.
+# Jobs and live sessions keep their event channels in the worker that runs
+# them, so use more than one worker only behind sticky sessions.
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+
+# Heartbeat timeout for a stuck worker; gthread keeps beating during long
+# /detect requests and SSE streams, so this only fires on a real hang
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+# Header limits; the upload body is capped by MAX_UPLOAD_MB and must arrive
+# within UPLOAD_TIMEOUT_SECONDS (408 otherwise), both enforced by the app.
+limit_request_line = 8190
+limit_request_fields = 100
+
+# No max_requests recycling: background jobs run inside the worker and would
+# be killed after graceful_timeout
+
+
+def post_fork(server, worker):
+    # Jobs a previous server left unfinished continue from their checkpoint;
+    # each is claimed by exactly one worker
+    from app import resume_jobs
+    resume_jobs()
+
+# Requests are logged (sampled, JSON) by the app itself
+accesslog = None
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info").lower()
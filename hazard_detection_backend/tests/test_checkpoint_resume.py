@@ -0,0 +1,144 @@
+"""
+Checkpoint/resume regression: a run interrupted mid-clip or after its last
+checkpoint, then called again with the same arguments, must write the same
+output bytes and stats as an uninterrupted run.
+
+YOLO is replaced by a deterministic dark-patch detector, so only the
+pipeline (decode, seek, tracker, segments, remux) is under test.
+
+    cd hazard_detection_backend && python -m pytest -q tests
+"""
+import os
+import sys
+import json
+import filecmp
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+pytest.importorskip("av")
+pytest.importorskip("torch")
+pytest.importorskip("ultralytics")
+if not os.path.exists(os.path.join(BACKEND_DIR, "model", "best.pt")):
+    pytest.skip("model/best.pt missing", allow_module_level=True)
+
+FRAMES = 120
+CHECKPOINT_EVERY = 30
+
+
+class _Tensor:
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array.copy()
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = _Tensor(data)
+
+    def __len__(self):
+        return len(self.data.array)
+
+
+class _Result:
+    def __init__(self, data):
+        self.boxes = _Boxes(data)
+
+
+class DarkPatchModel:
+    """Stand-in for YOLO: one box around the dark pixels of each image"""
+    def predict(self, source=None, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        results = []
+        for image in images:
+            dark = np.argwhere(image.mean(axis=2) < 60)
+            if len(dark):
+                (y1, x1), (y2, x2) = dark.min(0), dark.max(0)
+                results.append(_Result(np.array([[x1, y1, x2, y2, 0.9, 0]], np.float32)))
+            else:
+                results.append(_Result(np.zeros((0, 6), np.float32)))
+        return results
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.fixture(scope="module")
+def ud():
+    cwd = os.getcwd()
+    os.chdir(BACKEND_DIR)  # MODEL_PATH is relative to the backend folder
+    try:
+        import utils.unified_detection as module
+    finally:
+        os.chdir(cwd)
+    module.MODEL = DarkPatchModel()
+    return module
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    from run_benchmarks import make_synthetic_clip
+    return make_synthetic_clip(str(tmp_path_factory.mktemp("clip") / "clip.mp4"), 320, 180, FRAMES)
+
+
+def _run(ud, clip, out_dir, stream):
+    kwargs = {"stream_dir": os.path.join(out_dir, "stream")} if stream else {}
+    return ud.process_video_unified(
+        clip, os.path.join(out_dir, "out.mp4"), use_gpu=False, video_backend="pyav",
+        checkpoint_dir=os.path.join(out_dir, "checkpoint"), checkpoint_interval=CHECKPOINT_EVERY,
+        thumbnails_dir=os.path.join(out_dir, "thumbnails"), **kwargs
+    )
+
+
+def _comparable(stats):
+    return {
+        "total_potholes": stats["total_potholes"],
+        "total_frames": stats["total_frames"],
+        "thumbnails": stats["thumbnails"],
+        "frames_decoded": stats["stage_timings"]["decode"]["count"],
+        "frames_encoded": stats["stage_timings"]["encode"]["count"],
+    }
+
+
+@pytest.mark.parametrize("stream", [False, True], ids=["mp4", "hls"])
+@pytest.mark.parametrize("crash", ["mid_clip", "after_last_checkpoint"])
+def test_resume_matches_uninterrupted_run(ud, clip, tmp_path, monkeypatch, stream, crash):
+    expected = _run(ud, clip, str(tmp_path / "full"), stream)
+    assert expected["stage_timings"]["decode"]["count"] == FRAMES
+
+    resumed_dir = str(tmp_path / "resumed")
+    if crash == "mid_clip":
+        draw_overlay = ud.draw_overlay
+
+        def crash_at_frame(frame, **kwargs):
+            if kwargs["frame_num"] == 2 * CHECKPOINT_EVERY + 10:
+                raise Crash()
+            return draw_overlay(frame, **kwargs)
+        monkeypatch.setattr(ud, "draw_overlay", crash_at_frame)
+    else:
+        # Every frame is encoded and checkpointed; only the final join is lost
+        def crash_on_join(*args, **kwargs):
+            raise Crash()
+        monkeypatch.setattr(ud, "remux_to_mp4" if stream else "concat_to_mp4", crash_on_join)
+    with pytest.raises(Crash):
+        _run(ud, clip, resumed_dir, stream)
+    monkeypatch.undo()
+
+    resumed = _run(ud, clip, resumed_dir, stream)
+    assert _comparable(resumed) == _comparable(expected)
+    assert filecmp.cmp(expected["output_path"], resumed["output_path"], shallow=False)
+    with open(os.path.join(str(tmp_path / "full"), "thumbnails", "index.json")) as f:
+        expected_index = json.load(f)
+    with open(os.path.join(resumed_dir, "thumbnails", "index.json")) as f:
+        assert json.load(f) == expected_index
+    assert not os.path.exists(os.path.join(resumed_dir, "checkpoint"))
@@ -0,0 +1,108 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = "checkpoint.json"
+TIMINGS_FILE = "stage_timings.bin"
+SEGMENT_PATTERN = "part_%05d.mp4"
+DEFAULT_CHECKPOINT_INTERVAL = 900  # frames (30 s of 30 fps footage)
+
+
+def source_fingerprint(source_path: str, **params) -> str:
+    """
+    Identity of a run: input file (path, size, mtime) plus every option that
+    changes the output. A checkpoint is only resumed when this matches.
+    """
+    stat = os.stat(source_path)
+    payload = json.dumps(
+        {"source": os.path.abspath(source_path), "size": stat.st_size, "mtime": int(stat.st_mtime), "params": params},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class JobCheckpoint:
+    """
+    Resumable state of one process_video_unified run, kept in `checkpoint_dir`:
+
+        checkpoint.json     frame index, tracker state, counters, closed segments
+        stage_timings.bin   StageTimer samples
+        part_00000.mp4 ...  encoded output, one closed segment per checkpoint
+
+    The output is encoded as a sequence of segments that are closed at every
+    checkpoint, so everything up to the last checkpoint survives a crash and
+    only the frames after it are redone. Runs that stream HLS keep no
+    part_*.mp4: their .ts segments are the output, and checkpoint.json holds
+    the playlist as of the last checkpoint.
+    """
+    def __init__(self, checkpoint_dir: str, fingerprint: str):
+        self.dir = checkpoint_dir
+        self.fingerprint = fingerprint
+        self.segments: List[str] = []
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.dir, CHECKPOINT_FILE)
+
+    @property
+    def timings_path(self) -> str:
+        return os.path.join(self.dir, TIMINGS_FILE)
+
+    def segment_path(self, index: int) -> str:
+        return os.path.join(self.dir, SEGMENT_PATTERN % index)
+
+    def next_segment_path(self) -> str:
+        return self.segment_path(len(self.segments))
+
+    @property
+    def segment_paths(self) -> List[str]:
+        return [os.path.join(self.dir, name) for name in self.segments]
+
+    def load(self) -> Optional[Dict]:
+        """Saved state, or None when there is nothing (valid) to resume"""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r') as f:
+            try:
+                state = json.load(f)
+            except json.JSONDecodeError:
+                logger.warning(f"⚠️  Unreadable checkpoint in {self.dir}, starting over")
+                return self._discard()
+        if state.get("fingerprint") != self.fingerprint:
+            logger.warning(f"⚠️  Checkpoint in {self.dir} is for another input/settings, starting over")
+            return self._discard()
+        segments = state.get("segments", [])
+        if not all(os.path.exists(os.path.join(self.dir, name)) for name in segments):
+            logger.warning(f"⚠️  Checkpoint in {self.dir} is missing segments, starting over")
+            return self._discard()
+        self.segments = list(segments)
+        return state
+
+    def add_segment(self, path: str):
+        self.segments.append(os.path.basename(path))
+
+    def save(self, state: Dict):
+        """Atomically record `state`; call only after the current segment is closed"""
+        state = dict(state, fingerprint=self.fingerprint, segments=self.segments,
+                     saved=datetime.utcnow().isoformat())
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def _discard(self) -> None:
+        """Drop stale state and segments so they cannot be mixed into a fresh run"""
+        self.clear()
+        os.makedirs(self.dir, exist_ok=True)
+        self.segments = []
+        return None
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
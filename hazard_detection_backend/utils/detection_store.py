@@ -0,0 +1,74 @@
+import os
+import json
+import contextlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+DETECTIONS_FILE = "detections.json"
+
+
+@contextlib.contextmanager
+def _locked(data_dir: str):
+    """Exclusive lock so the web app and batch workers can append concurrently"""
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, DETECTIONS_FILE + ".lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_detections(data_dir: str) -> List[Dict]:
+    metadata_file = os.path.join(data_dir, DETECTIONS_FILE)
+    if not os.path.exists(metadata_file):
+        return []
+    with open(metadata_file, 'r') as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return []
+
+
+def build_detection_record(filename: str, lat: Optional[float], lon: Optional[float], stats: Dict, **extra) -> Dict:
+    record = {
+        "filename": filename,
+        "start_latitude": lat,
+        "start_longitude": lon,
+        "timestamp": datetime.utcnow().isoformat(),
+        "statistics": stats
+    }
+    record.update(extra)
+    return record
+
+
+def append_detections(data_dir: str, records: List[Dict]) -> List[Dict]:
+    """
+    Append records to detections.json (read-modify-write under a file lock,
+    atomic replace). A record carrying an "input_key" replaces an existing
+    record with the same key, so re-processing an input never counts twice.
+    """
+    metadata_file = os.path.join(data_dir, DETECTIONS_FILE)
+    with _locked(data_dir):
+        detections = load_detections(data_dir)
+        positions = {d["input_key"]: i for i, d in enumerate(detections) if d.get("input_key")}
+        for record in records:
+            key = record.get("input_key")
+            if key is not None and key in positions:
+                detections[positions[key]] = record
+            else:
+                if key is not None:
+                    positions[key] = len(detections)
+                detections.append(record)
+        tmp_path = metadata_file + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(detections, f, indent=2)
+        os.replace(tmp_path, metadata_file)
+    return records
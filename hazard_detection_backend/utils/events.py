@@ -0,0 +1,95 @@
+import json
+import queue
+import threading
+from typing import Dict, Iterator, Optional
+
+KEEPALIVE_SECONDS = 15
+
+
+def format_sse(data: Dict, event: Optional[str] = None) -> str:
+    """Encode one Server-Sent Events message"""
+    message = f"data: {json.dumps(data, separators=(',', ':'))}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+
+
+class EventChannel:
+    """
+    Fan-out of events to SSE subscribers.
+
+    Each subscriber gets a small bounded queue; when a client reads slower
+    than we publish, its oldest events are dropped so the publisher (the
+    detection loop) never blocks on a network socket.
+    """
+    def __init__(self, max_queue: int = 64):
+        self.max_queue = max_queue
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.last_event = None
+
+    @staticmethod
+    def _put(q: queue.Queue, message: Optional[str]):
+        """Enqueue without blocking, dropping the oldest event when the queue is full"""
+        while True:
+            try:
+                q.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def publish(self, data: Dict, event: Optional[str] = None):
+        message = format_sse(data, event)
+        self.last_event = (event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            self._put(q, message)
+
+    def close(self):
+        """
+        End all subscriptions after already-queued events are delivered. The
+        end-of-stream marker is never dropped: a slow subscriber loses its
+        oldest event instead.
+        """
+        with self._lock:
+            self._closed = True
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            self._put(q, None)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def subscribe(self, replay_last: bool = True) -> Iterator[str]:
+        """Generator of SSE-encoded messages, suitable for a streaming Response"""
+        q = queue.Queue(maxsize=self.max_queue)
+        if replay_last and self.last_event is not None:
+            event, data = self.last_event
+            q.put_nowait(format_sse(data, event))
+        # Checked together with the append, so a concurrent close() either
+        # sees this queue or is seen here
+        with self._lock:
+            if self._closed:
+                q.put_nowait(None)
+            else:
+                self._subscribers.append(q)
+        try:
+            while True:
+                try:
+                    message = q.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            with self._lock:
+                if q in self._subscribers:
+                    self._subscribers.remove(q)
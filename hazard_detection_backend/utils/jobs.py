@@ -0,0 +1,245 @@
+import os
+import json
+import uuid
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from utils.events import EventChannel
+from utils.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+JOB_FILE = "job.json"
+JOB_LOCK_FILE = "job.lock"
+UNFINISHED_STATUSES = ("queued", "running")
+
+
+class Job:
+    """State of one background detection job, mirrored to <job_dir>/job.json"""
+    def __init__(self, job_id: str, job_dir: str, params: Dict):
+        self.id = job_id
+        self.dir = job_dir
+        self.params = params
+        self.status = "queued"
+        self.created = datetime.utcnow().isoformat()
+        self.finished = None
+        self.stats = None
+        self.error = None
+        self.progress = None
+        self.channel = EventChannel()
+        self._claim = None
+
+    def report_progress(self, progress: Dict):
+        """progress_callback for process_video_unified: keep latest + push to SSE"""
+        self.progress = progress
+        self.channel.publish(progress, event="progress")
+
+    def finish(self):
+        """Publish the terminal state and end SSE subscriptions"""
+        self.channel.publish(self.to_dict(), event=self.status)
+        self.channel.close()
+
+    @property
+    def stream_dir(self) -> str:
+        return os.path.join(self.dir, "stream")
+
+    @property
+    def thumbnails_dir(self) -> str:
+        return os.path.join(self.dir, "thumbnails")
+
+    @property
+    def output_path(self) -> str:
+        return os.path.join(self.dir, "processed.mp4")
+
+    @property
+    def checkpoint_dir(self) -> str:
+        return os.path.join(self.dir, "checkpoint")
+
+    def claim(self) -> bool:
+        """
+        Take ownership of the job for this process (flock on job.lock, held
+        until release_claim). Fails while another live process owns it; the
+        kernel drops the lock when its owner dies.
+        """
+        if self._claim is not None:
+            return True
+        lock_file = open(os.path.join(self.dir, JOB_LOCK_FILE), "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+        self._claim = lock_file
+        return True
+
+    def release_claim(self):
+        if self._claim is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._claim, fcntl.LOCK_UN)
+        self._claim.close()
+        self._claim = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "created": self.created,
+            "finished": self.finished,
+            "progress": self.progress,
+            "params": self.params,
+            "stats": self.stats,
+            "error": self.error,
+        }
+
+    def save(self):
+        tmp_path = os.path.join(self.dir, JOB_FILE + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, os.path.join(self.dir, JOB_FILE))
+
+    @classmethod
+    def load(cls, job_dir: str, owned: bool = False) -> Optional["Job"]:
+        """
+        Read a job back from job.json. `owned` is for a job this process is
+        about to run again, whose channel stays open for its new events.
+        """
+        path = os.path.join(job_dir, JOB_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError:
+                return None
+        job = cls(data["id"], job_dir, data.get("params", {}))
+        job.status = data.get("status", "unknown")
+        job.created = data.get("created")
+        job.finished = data.get("finished")
+        job.stats = data.get("stats")
+        job.error = data.get("error")
+        job.progress = data.get("progress")
+        if owned:
+            return job
+        # Nothing in this process publishes to a job read back from disk (it is
+        # finished, or run by a dead process or another worker), so subscribers
+        # get its current state as one snapshot event and the stream ends
+        # instead of idling on keepalives; EventSource clients reconnect and
+        # thereby poll job.json.
+        job.finish()
+        return job
+
+
+class JobManager:
+    """
+    Runs detection jobs on a small thread pool so HTTP requests return
+    immediately. One worker by default: the model/GPU is shared, so jobs
+    queue instead of competing for it.
+    """
+    def __init__(self, jobs_dir: str, max_workers: int = 1):
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="detect-job")
+        self._queued = 0
+        self._running = 0
+
+    def _update_gauges(self, queued: int = 0, running: int = 0):
+        with self._lock:
+            self._queued += queued
+            self._running += running
+            METRICS.set("hazard_jobs_queued", self._queued)
+            METRICS.set("hazard_jobs_running", self._running)
+
+    def create(self, params: Dict) -> Job:
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        job = Job(job_id, job_dir, params)
+        job.claim()  # so a worker starting up meanwhile does not take it for an abandoned job
+        job.save()
+        with self._lock:
+            self._jobs[job_id] = job
+        return job
+
+    def submit(self, job: Job, target: Callable[[Job], Dict], slot=None, slots=None):
+        """
+        Run target(job) in the background; its return value becomes job.stats.
+        `slot` (utils.slots.Slot) is released once the job ends; without one,
+        a slot is first waited for from `slots` (utils.slots.HostSlots).
+        """
+        self._update_gauges(queued=1)
+        self._executor.submit(self._run, job, target, slot, slots)
+
+    def resume_unfinished(self, target: Callable[[Job], Dict], slots=None) -> List[Job]:
+        """
+        Resubmit jobs left queued/running by a process that died (restart,
+        deploy, OOM). Each is claimed first, so with several workers every
+        job is picked up exactly once and never while its owner is alive.
+        target(job) continues from the job's checkpoint when it has one.
+        """
+        resumed = []
+        for job_id in sorted(os.listdir(self.jobs_dir)):
+            job_dir = os.path.join(self.jobs_dir, job_id)
+            with self._lock:
+                if job_id in self._jobs:
+                    continue
+            job = Job.load(job_dir, owned=True) if os.path.isdir(job_dir) else None
+            if job is None or job.status not in UNFINISHED_STATUSES or not job.claim():
+                continue
+            # Owners save the final state before letting go, so re-read under the claim
+            current = Job.load(job_dir, owned=True)
+            if current is None or current.status not in UNFINISHED_STATUSES:
+                job.release_claim()
+                continue
+            job.status = "queued"
+            job.save()
+            with self._lock:
+                self._jobs[job.id] = job
+            self.submit(job, target, slots=slots)
+            resumed.append(job)
+            logger.info(f"♻️  Resuming job {job.id}")
+        return resumed
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        # Jobs from a previous process (or another worker) are read back from disk
+        if not job_id.isalnum():
+            return None
+        return Job.load(os.path.join(self.jobs_dir, job_id))
+
+    def _run(self, job: Job, target: Callable[[Job], Dict], slot=None, slots=None):
+        if slot is None and slots is not None:
+            slot = slots.acquire()
+        self._update_gauges(queued=-1, running=1)
+        job.status = "running"
+        job.save()
+        job.channel.publish(job.to_dict(), event="running")
+        try:
+            job.stats = target(job)
+            job.status = "done"
+        except Exception as e:
+            logger.exception(f"❌ Job {job.id} failed")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            self._update_gauges(running=-1)
+            if slot is not None:
+                slot.release()
+        job.finished = datetime.utcnow().isoformat()
+        job.save()
+        job.release_claim()
+        job.finish()
@@ -0,0 +1,318 @@
+import os
+import sys
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional, Union
+
+import cv2
+
+from utils.events import EventChannel
+from utils.metrics import METRICS, StageTimer
+
+logger = logging.getLogger(__name__)
+
+
+def parse_source(source: Union[str, int]) -> Union[str, int]:
+    """'0' -> device index 0; RTSP/HTTP URLs and file paths are passed through"""
+    if isinstance(source, int):
+        return source
+    source = str(source).strip()
+    return int(source) if source.isdigit() else source
+
+
+def is_file_source(source: Union[str, int]) -> bool:
+    return isinstance(source, str) and "://" not in source and os.path.isfile(source)
+
+
+class LatestFrameReader:
+    """
+    Grabs frames on a background thread and keeps only the newest one.
+
+    When inference is slower than the camera, intermediate frames are
+    overwritten instead of queueing up, so latency stays bounded to roughly
+    one inference time. File sources are replayed at their native fps
+    (`realtime=True`) to behave like a live camera.
+
+    Only file sources end. Network/device sources that stop delivering
+    (RTSP hiccups, a vehicle driving through a dead zone) are reopened with
+    exponential backoff until release() is called.
+    """
+    MAX_FAILED_READS = 5       # consecutive failed reads before reconnecting
+    MAX_BACKOFF_SECONDS = 10.0
+
+    def __init__(self, source: Union[str, int], realtime: Optional[bool] = None):
+        self.source = parse_source(source)
+        self.is_file = is_file_source(self.source)
+        self.cap = self._open()
+        if self.cap is None:
+            raise RuntimeError(f"Cannot open stream: {source}")
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.realtime = self.is_file if realtime is None else realtime
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_index = 0  # frames grabbed from the source
+        self._frame_time = 0.0
+        self._last_returned = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+        self._ended = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._grab_loop, name="live-grab", daemon=True)
+        self._thread.start()
+
+    def _open(self) -> Optional[cv2.VideoCapture]:
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        # Keep the driver-side buffer minimal for RTSP/webcams
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _reconnect(self) -> bool:
+        """Reopen the source with backoff; False only when release() was called"""
+        self.cap.release()
+        backoff = 0.5
+        while not self._stop.is_set():
+            logger.warning(f"📡 Live source {self.source} lost, reconnecting in {backoff:.1f}s")
+            if self._stop.wait(backoff):
+                break
+            cap = self._open()
+            if cap is not None:
+                self.cap = cap
+                self.reconnects += 1
+                logger.info(f"📡 Live source {self.source} reconnected")
+                return True
+            backoff = min(backoff * 2, self.MAX_BACKOFF_SECONDS)
+        return False
+
+    def _grab_loop(self):
+        interval = 1.0 / self.fps if self.realtime and self.fps > 0 else 0.0
+        next_time = time.perf_counter()
+        failed_reads = 0
+        while not self._stop.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                if self.is_file:
+                    break
+                # Transient failures are normal on RTSP/MJPEG; reopen only if they persist
+                failed_reads += 1
+                if failed_reads < self.MAX_FAILED_READS:
+                    self._stop.wait(0.05)
+                    continue
+                failed_reads = 0
+                if not self._reconnect():
+                    break
+                next_time = time.perf_counter()
+                continue
+            failed_reads = 0
+            with self._cond:
+                self._frame = frame
+                self._frame_index += 1
+                self._frame_time = time.time()
+                self._cond.notify_all()
+            if interval:
+                next_time += interval
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_time = time.perf_counter()
+        with self._cond:
+            self._ended = True
+            self._cond.notify_all()
+
+    @property
+    def ended(self) -> bool:
+        """True once the source is finished for good (file end or release())"""
+        return self._ended
+
+    def read(self, timeout: float = 5.0):
+        """
+        Block until a frame newer than the last one returned is available.
+        Returns (frame_index, capture_time, frame), or None when `timeout`
+        passes without a new frame or the stream ended (check `ended`).
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._frame_index > self._last_returned or self._ended, timeout)
+            if self._frame_index <= self._last_returned:
+                return None
+            self.frames_dropped += self._frame_index - self._last_returned - 1
+            self._last_returned = self._frame_index
+            return self._frame_index, self._frame_time, self._frame
+
+    def release(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+        self.cap.release()
+
+
+def run_live_detection(
+    source: Union[str, int],
+    channel: EventChannel,
+    stop_event: threading.Event,
+    conf: float = 0.25,
+    use_gpu: bool = True,
+    realtime: Optional[bool] = None
+) -> Dict:
+    """
+    Detect potholes on a live source until it ends or stop_event is set,
+    publishing one 'detections' event per processed frame.
+    """
+    # Importing loads the YOLO model; keep it out of module import time
+    from utils.unified_detection import DEVICE, PotholeTracker, detect_potholes, warmup_model
+
+    device = DEVICE if use_gpu else "cpu"
+    reader = LatestFrameReader(source, realtime=realtime)
+    logger.info(f"📡 Live source {source}: {reader.width}x{reader.height} @ {reader.fps:.1f}fps, device={device}")
+    warmup_model(device)
+
+    tracker = PotholeTracker()
+    timer = StageTimer()
+    dropped_reported = 0
+    processed = 0
+    start_time = time.time()
+    channel.publish({
+        "source": str(source),
+        "width": reader.width,
+        "height": reader.height,
+        "fps": reader.fps,
+    }, event="started")
+
+    last_frame_time = time.time()
+    try:
+        while not stop_event.is_set():
+            item = reader.read()
+            if item is None:
+                if reader.ended:
+                    break
+                # Stalled network source: keep the session and tell clients why it is quiet
+                channel.publish({
+                    "seconds_since_frame": round(time.time() - last_frame_time, 1),
+                    "reconnects": reader.reconnects,
+                }, event="stalled")
+                continue
+            frame_index, capture_time, frame = item
+            last_frame_time = time.time()
+
+            detections = detect_potholes(frame, conf=conf, device=device, timer=timer)
+            t = time.perf_counter()
+            tracked_potholes = tracker.update(detections)
+            timer.record("track", t)
+            processed += 1
+            METRICS.inc("hazard_frames_processed_total")
+            if reader.frames_dropped > dropped_reported:
+                METRICS.inc("hazard_live_frames_dropped_total", reader.frames_dropped - dropped_reported)
+                dropped_reported = reader.frames_dropped
+
+            elapsed = time.time() - start_time
+            channel.publish({
+                "frame": frame_index,
+                "timestamp": capture_time,
+                "latency_ms": round((time.time() - capture_time) * 1000, 1),
+                "frames_dropped": reader.frames_dropped,
+                "processing_fps": round(processed / elapsed, 2) if elapsed > 0 else 0,
+                "potholes": [
+                    {"id": pid, "bbox": list(bbox), "conf": round(conf, 3)}
+                    for (pid, bbox), conf in zip(tracked_potholes.tracked(), tracked_potholes.conf.tolist())
+                ],
+                "total_potholes": tracker.get_total_count(),
+            }, event="detections")
+    finally:
+        reader.release()
+
+    total_time = time.time() - start_time
+    stats = {
+        "total_potholes": tracker.get_total_count(),
+        "frames_processed": processed,
+        "frames_dropped": reader.frames_dropped,
+        "reconnects": reader.reconnects,
+        "processing_time": total_time,
+        "processing_fps": processed / total_time if total_time > 0 else 0,
+        "device_used": device,
+        "stage_timings": timer.summary(),
+    }
+    channel.publish(stats, event="finished")
+    channel.close()
+    return stats
+
+
+class LiveSession:
+    """
+    One running live-source detection loop and its event channel.
+    `on_end(session)` is called once the loop has stopped, finished or failed.
+    """
+    def __init__(self, source: Union[str, int], slot=None, on_end: Callable[["LiveSession"], None] = None,
+                 **kwargs):
+        self.id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.slot = slot  # released when the loop ends
+        self.on_end = on_end
+        self.options = kwargs
+        self.started = datetime.utcnow().isoformat()
+        self.status = "running"
+        self.stats = None
+        self.error = None
+        self.channel = EventChannel()
+        self.stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"live-{self.id}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.stats = run_live_detection(self.source, self.channel, self.stop_event, **self.options)
+            self.status = "stopped" if self.stop_event.is_set() else "finished"
+        except Exception as e:
+            logger.exception(f"❌ Live session {self.id} failed")
+            self.error = str(e)
+            self.status = "failed"
+            self.channel.publish({"error": self.error}, event="error")
+            self.channel.close()
+        finally:
+            if self.slot is not None:
+                self.slot.release()
+            if self.on_end is not None:
+                self.on_end(self)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "source": str(self.source),
+            "status": self.status,
+            "started": self.started,
+            "stats": self.stats,
+            "error": self.error,
+        }
+
+
+if __name__ == "__main__":
+    # Quick check without the web server: replay a file as a fake live stream
+    #   python -m utils.live_stream video4.mp4
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Live pothole detection on RTSP/HTTP/device/file sources")
+    parser.add_argument("source", help="rtsp://..., http://..., device index (0) or a video file")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--cpu", action="store_true")
+    parser.add_argument("--no-realtime", action="store_true", help="read files as fast as possible")
+    args = parser.parse_args()
+
+    channel = EventChannel()
+    stop = threading.Event()
+    printer = threading.Thread(target=lambda: [sys.stdout.write(m) for m in channel.subscribe()], daemon=True)
+    printer.start()
+    try:
+        run_live_detection(args.source, channel, stop, conf=args.conf, use_gpu=not args.cpu,
+                           realtime=False if args.no_realtime else None)
+    except KeyboardInterrupt:
+        stop.set()
+    printer.join(timeout=1)
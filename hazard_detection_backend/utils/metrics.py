@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+from array import array
+from typing import Dict, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+# Latency buckets in seconds: sub-ms (tracking, overlay) up to seconds (CPU YOLO on 4K)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+PIPELINE_STAGES = ("decode", "predict", "extract", "track", "face", "plate", "thumbnail", "draw", "overlay", "encode")
+
+
+def _labels_key(labels: Optional[Dict[str, str]]) -> Tuple:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(key: Tuple, extra: Tuple = ()) -> str:
+    items = key + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics)"""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and histograms rendered in Prometheus text format"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._gauges: Dict[str, Dict[Tuple, float]] = {}
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, labels: Dict[str, str] = None):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, labels: Dict[str, str] = None):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_labels_key(labels)] = value
+
+    def observe(self, name: str, value: float, labels: Dict[str, str] = None):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+            hist.observe(value)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        self.set("process_resident_memory_bytes", current_rss_bytes())
+        self.set("process_peak_resident_memory_bytes", peak_rss_bytes())
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted(metrics):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in metrics[name].items():
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            for name in sorted(self._histograms):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in self._histograms[name].items():
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', f'{bound:g}'),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {hist.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {hist.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+METRICS.describe("hazard_stage_seconds", "Per-frame latency of each pipeline stage")
+METRICS.describe("hazard_frames_processed_total", "Frames run through the detection pipeline")
+METRICS.describe("hazard_processing_fps", "Throughput of the most recent job")
+METRICS.describe("hazard_model_load_seconds", "Time to load the YOLO model at startup")
+METRICS.describe("hazard_jobs_queued", "Background jobs waiting for a worker")
+METRICS.describe("hazard_jobs_running", "Background jobs currently processing")
+METRICS.describe("hazard_live_frames_dropped_total", "Stale live-stream frames skipped to bound latency")
+METRICS.describe("hazard_http_request_seconds", "HTTP request latency by route")
+METRICS.describe("hazard_requests_rejected_total", "Inference requests refused with 503 (host at capacity)")
+METRICS.describe("hazard_inference_slots_held", "Host inference slots held by this worker")
+
+
+def current_rss_bytes() -> int:
+    """Resident set size now (Linux /proc; falls back to peak RSS elsewhere)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageTimer:
+    """
+    Per-job stage latencies. Samples are kept (8 bytes each) for exact
+    percentiles in the job stats and mirrored into the global histograms.
+
+        t = time.perf_counter()
+        ...decode...
+        timer.record("decode", t)
+    """
+    def __init__(self, registry: MetricsRegistry = METRICS):
+        self.registry = registry
+        self.samples: Dict[str, array] = {}
+
+    def record(self, stage: str, start: float) -> float:
+        """Record time since `start` (a perf_counter value); returns now"""
+        now = time.perf_counter()
+        self.add(stage, now - start)
+        return now
+
+    def add(self, stage: str, seconds: float):
+        samples = self.samples.get(stage)
+        if samples is None:
+            samples = self.samples[stage] = array("d")
+        samples.append(seconds)
+        self.registry.observe("hazard_stage_seconds", seconds, {"stage": stage})
+
+    def save(self, path: str):
+        """Write the raw samples (binary, atomically) so a resumed job keeps its timings"""
+        # One JSON header line {stage: count}, then the float64 samples back to back
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps({stage: len(samples) for stage, samples in self.samples.items()}).encode() + b"\n")
+            for samples in self.samples.values():
+                samples.tofile(f)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        """Restore samples written by save() (not re-observed into the global histograms)"""
+        with open(path, "rb") as f:
+            counts = json.loads(f.readline())
+            for stage, count in counts.items():
+                samples = array("d")
+                samples.fromfile(f, count)
+                self.samples[stage] = samples
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        summary = {}
+        order = {stage: i for i, stage in enumerate(PIPELINE_STAGES)}
+        for stage in sorted(self.samples, key=lambda s: order.get(s, len(order))):
+            samples = self.samples[stage]
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            n = len(ordered)
+            total = sum(ordered)
+            summary[stage] = {
+                "count": n,
+                "total_s": round(total, 4),
+                "mean_ms": round(total / n * 1000, 3),
+                "p50_ms": round(ordered[n // 2] * 1000, 3),
+                "p95_ms": round(ordered[min(n - 1, int(n * 0.95))] * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3),
+            }
+        return summary
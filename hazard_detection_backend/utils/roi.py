@@ -0,0 +1,229 @@
+import os
+import json
+import contextlib
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+DEFAULT_ROAD_TOP = 0.4  # lower 60% of the frame when nothing better is known
+PROFILES_FILE = "camera_profiles.json"
+
+
+class RoadROI:
+    """
+    Road region of interest as a polygon in normalised (0-1) frame
+    coordinates, so one profile works for any output resolution of the
+    same camera.
+    """
+    def __init__(self, polygon: Sequence[Tuple[float, float]], source: str = "manual"):
+        try:
+            points = [(float(x), float(y)) for x, y in polygon]
+        except (TypeError, ValueError):
+            raise ValueError("ROI polygon must be a list of (x, y) pairs")
+        if len(points) < 3:
+            raise ValueError("ROI polygon needs at least 3 points")
+        if not all(0.0 <= v <= 1.0 for point in points for v in point):
+            raise ValueError("ROI points must be fractions of the frame, within [0, 1]")
+        xs, ys = [x for x, _ in points], [y for _, y in points]
+        if max(xs) <= min(xs) or max(ys) <= min(ys):
+            raise ValueError("ROI polygon has no area")
+        self.polygon = points
+        self.source = source
+        self._cache = {}
+
+    @classmethod
+    def lower_fraction(cls, top: float = DEFAULT_ROAD_TOP, bottom: float = 1.0, source: str = "manual") -> "RoadROI":
+        """Full-width band from `top` to `bottom` (fractions of frame height)"""
+        if not 0.0 <= top < bottom <= 1.0:
+            raise ValueError(f"ROI band needs 0 <= top < bottom <= 1, got top={top}, bottom={bottom}")
+        return cls([(0.0, top), (1.0, top), (1.0, bottom), (0.0, bottom)], source=source)
+
+    @property
+    def is_rectangle(self) -> bool:
+        xs = sorted(set(x for x, _ in self.polygon))
+        ys = sorted(set(y for _, y in self.polygon))
+        return len(self.polygon) == 4 and len(xs) == 2 and len(ys) == 2
+
+    def to_pixels(self, width: int, height: int) -> np.ndarray:
+        return np.array([[round(x * width), round(y * height)] for x, y in self.polygon], np.int32)
+
+    def bounding_rect(self, width: int, height: int) -> Tuple[int, int, int, int]:
+        """(x1, y1, x2, y2) crop of the polygon, clipped to the frame"""
+        key = ("rect", width, height)
+        if key not in self._cache:
+            points = self.to_pixels(width, height)
+            x1, y1 = np.clip(points.min(axis=0), 0, [width, height])
+            x2, y2 = np.clip(points.max(axis=0), 0, [width, height])
+            self._cache[key] = (int(x1), int(y1), int(x2), int(y2))
+        return self._cache[key]
+
+    def crop_mask(self, width: int, height: int) -> Optional[np.ndarray]:
+        """uint8 mask of the polygon inside its bounding rect, or None for rectangles"""
+        if self.is_rectangle:
+            return None
+        key = ("mask", width, height)
+        if key not in self._cache:
+            x1, y1, x2, y2 = self.bounding_rect(width, height)
+            mask = np.zeros((y2 - y1, x2 - x1), np.uint8)
+            cv2.fillPoly(mask, [self.to_pixels(width, height) - [x1, y1]], 255)
+            self._cache[key] = mask
+        return self._cache[key]
+
+    def crop(self, frame: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Crop (and mask, for non-rectangular polygons) the frame; returns (crop, (dx, dy))"""
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = self.bounding_rect(width, height)
+        crop = frame[y1:y2, x1:x2]
+        mask = self.crop_mask(width, height)
+        if mask is not None:
+            crop = cv2.bitwise_and(crop, crop, mask=mask)
+        return crop, (x1, y1)
+
+    def pixel_fraction(self, width: int, height: int) -> float:
+        """Share of frame pixels inside the crop that inference sees"""
+        x1, y1, x2, y2 = self.bounding_rect(width, height)
+        return (x2 - x1) * (y2 - y1) / float(width * height) if width and height else 1.0
+
+    def to_dict(self) -> Dict:
+        return {"polygon": [[round(x, 4), round(y, 4)] for x, y in self.polygon], "source": self.source}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RoadROI":
+        return cls(data["polygon"], source=data.get("source", "manual"))
+
+
+class ROICalibrator:
+    """
+    Estimates the road band from the first N frames while they are processed
+    full-frame.
+
+    Sky and the car's own hood/dashboard barely change between frames, while
+    the road surface streams past the camera, so rows with high frame-to-frame
+    change mark the road. Pothole boxes detected during calibration are
+    always kept inside the result.
+    """
+    def __init__(self, frames: int = 30, sample_width: int = 160, min_band: float = 0.2,
+                 max_top: float = 0.7, margin: float = 0.03):
+        self.frames = frames
+        self.sample_width = sample_width
+        self.min_band = min_band
+        self.max_top = max_top
+        self.margin = margin
+        self._previous = None
+        self._row_energy = None
+        self._box_top = 1.0
+        self._box_bottom = 0.0
+        self.seen = 0
+
+    @property
+    def done(self) -> bool:
+        return self.seen >= self.frames
+
+    def add(self, frame: np.ndarray, boxes_xyxy: np.ndarray = None):
+        height, width = frame.shape[:2]
+        sample_height = max(1, int(height * self.sample_width / width))
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (self.sample_width, sample_height),
+                           interpolation=cv2.INTER_AREA).astype(np.float32)
+        if self._previous is not None and self._previous.shape == small.shape:
+            diff = np.abs(small - self._previous).mean(axis=1)
+            self._row_energy = diff if self._row_energy is None else self._row_energy + diff
+        self._previous = small
+        if boxes_xyxy is not None and len(boxes_xyxy):
+            self._box_top = min(self._box_top, float(boxes_xyxy[:, 1].min()) / height)
+            self._box_bottom = max(self._box_bottom, float(boxes_xyxy[:, 3].max()) / height)
+        self.seen += 1
+
+    def result(self) -> RoadROI:
+        top, bottom = DEFAULT_ROAD_TOP, 1.0
+        if self._row_energy is not None and self._row_energy.max() > 0:
+            energy = np.convolve(self._row_energy, np.ones(5) / 5, mode="same")
+            active = np.flatnonzero(energy >= 0.35 * np.percentile(energy, 90))
+            if len(active):
+                rows = len(energy)
+                top = active[0] / rows
+                bottom = (active[-1] + 1) / rows
+        # Never drop rows that contained a detected pothole
+        top = min(top, self._box_top)
+        bottom = max(bottom, self._box_bottom)
+        top = min(max(0.0, top - self.margin), self.max_top)
+        bottom = min(1.0, bottom + self.margin)
+        if bottom - top < self.min_band:
+            bottom = min(1.0, top + self.min_band)
+            top = bottom - self.min_band
+        return RoadROI.lower_fraction(round(top, 4), round(bottom, 4), source="auto")
+
+
+# ----------------- Camera profiles -----------
+def _profiles_path(data_dir: str) -> str:
+    return os.path.join(data_dir, PROFILES_FILE)
+
+
+@contextlib.contextmanager
+def _profiles_locked(data_dir: str):
+    """Exclusive lock so web workers and batch processes can save profiles concurrently"""
+    os.makedirs(data_dir, exist_ok=True)
+    with open(_profiles_path(data_dir) + ".lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_camera_profiles(data_dir: str) -> Dict[str, Dict]:
+    path = _profiles_path(data_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+
+def load_camera_roi(data_dir: str, profile: str) -> Optional[RoadROI]:
+    entry = load_camera_profiles(data_dir).get(profile)
+    if not entry or "roi" not in entry:
+        return None
+    return RoadROI.from_dict(entry["roi"])
+
+
+def save_camera_roi(data_dir: str, profile: str, roi: RoadROI) -> Dict:
+    with _profiles_locked(data_dir):
+        profiles = load_camera_profiles(data_dir)
+        entry = profiles.setdefault(profile, {})
+        entry["roi"] = roi.to_dict()
+        entry["updated"] = datetime.utcnow().isoformat()
+        tmp_path = _profiles_path(data_dir) + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(profiles, f, indent=2)
+        os.replace(tmp_path, _profiles_path(data_dir))
+    return entry
+
+
+def parse_roi(value) -> Union[RoadROI, str, None]:
+    """
+    ROI option from a request/CLI: None, "auto", a top fraction ("0.45"),
+    or a JSON polygon ("[[0.1,0.5],[0.9,0.5],[1,1],[0,1]]").
+    Returns None, "auto" or a RoadROI.
+    """
+    if value is None or isinstance(value, RoadROI) or value == "auto":
+        return value
+    if isinstance(value, (int, float)):
+        return RoadROI.lower_fraction(float(value))
+    value = str(value).strip()
+    if not value:
+        return None
+    if value.startswith("["):
+        points: List = json.loads(value)
+        return RoadROI(points)
+    return RoadROI.lower_fraction(float(value))
@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from utils.metrics import METRICS
+
+
+class Slot:
+    """One held inference slot; release() is idempotent"""
+    def __init__(self, pool: "HostSlots", index: int, lock_file):
+        self.pool = pool
+        self.index = index
+        self._file = lock_file
+
+    def release(self):
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+        self.pool._released()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class HostSlots:
+    """
+    Caps concurrent inference jobs across every worker process on the host.
+
+    Each slot is an flock'ed file in `lock_dir`; the kernel drops the lock
+    when its holder exits, so a crashed worker never leaks a slot.
+    """
+    def __init__(self, lock_dir: str, slots: int = 1):
+        self.lock_dir = lock_dir
+        self.slots = max(1, slots)
+        self._held = 0
+        self._lock = threading.Lock()
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def _path(self, index: int) -> str:
+        return os.path.join(self.lock_dir, f"slot_{index}.lock")
+
+    def try_acquire(self) -> Optional[Slot]:
+        """A free slot, or None when the host is at capacity (never blocks)"""
+        for index in range(self.slots):
+            lock_file = open(self._path(index), "a")
+            if fcntl is None:
+                # No flock: fall back to a per-process cap
+                with self._lock:
+                    if self._held >= self.slots:
+                        lock_file.close()
+                        return None
+                    self._held += 1
+                    METRICS.set("hazard_inference_slots_held", self._held)
+                return Slot(self, index, lock_file)
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            with self._lock:
+                self._held += 1
+                METRICS.set("hazard_inference_slots_held", self._held)
+            return Slot(self, index, lock_file)
+        return None
+
+    def acquire(self, poll_seconds: float = 1.0) -> Slot:
+        """Wait for a free slot (background work that must run eventually, e.g. resumed jobs)"""
+        while True:
+            slot = self.try_acquire()
+            if slot is not None:
+                return slot
+            time.sleep(poll_seconds)
+
+    def _released(self):
+        with self._lock:
+            self._held -= 1
+            METRICS.set("hazard_inference_slots_held", self._held)
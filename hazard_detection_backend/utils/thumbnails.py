@@ -0,0 +1,138 @@
+import os
+import json
+from typing import Dict, Iterable, Optional
+
+import cv2
+import numpy as np
+
+from utils.tracking import FrameDetections
+
+THUMBNAIL_MODES = ("confidence", "area")
+THUMBNAIL_FORMATS = {"jpg": cv2.IMWRITE_JPEG_QUALITY, "webp": cv2.IMWRITE_WEBP_QUALITY}
+THUMBNAIL_MIMETYPES = {"jpg": "image/jpeg", "webp": "image/webp"}
+THUMBNAIL_INDEX = "index.json"
+
+
+class ThumbnailCollector:
+    """
+    Keeps the best crop of every pothole track: highest confidence
+    (mode="confidence") or largest box (mode="area").
+
+    Crops are downscaled to `max_size` px as soon as they win and stay in
+    memory only while their track is alive; flush() encodes the finished
+    ones to <output_dir>/track_<id>.<fmt> and rewrites index.json, so
+    reviewers can open thumbnails while the video is still processing.
+    """
+    def __init__(self, output_dir: str, mode: str = "confidence", fmt: str = "jpg", max_size: int = 256,
+                 quality: int = 85, padding: float = 0.15, fps: float = 0.0):
+        if mode not in THUMBNAIL_MODES:
+            raise ValueError(f"Unknown thumbnail mode '{mode}'. Choose from {THUMBNAIL_MODES}")
+        if fmt not in THUMBNAIL_FORMATS:
+            raise ValueError(f"Unknown thumbnail format '{fmt}'. Choose from {tuple(THUMBNAIL_FORMATS)}")
+        self.output_dir = output_dir
+        self.mode = mode
+        self.fmt = fmt
+        self.max_size = max_size
+        self.quality = quality
+        self.padding = padding
+        self.fps = fps
+        self.tracks: Dict[int, Dict] = {}
+        self._pending: Dict[int, np.ndarray] = {}
+        self._written: Dict[int, Dict] = {}  # what index.json describes
+        os.makedirs(output_dir, exist_ok=True)
+
+    def filename(self, track_id: int) -> str:
+        return f"track_{track_id:05d}.{self.fmt}"
+
+    def _crop(self, frame: np.ndarray, box) -> np.ndarray:
+        """Box plus some context around it, downscaled to fit max_size"""
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = box
+        pad_x = int((x2 - x1) * self.padding)
+        pad_y = int((y2 - y1) * self.padding)
+        x1, y1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
+        x2, y2 = min(width, x2 + pad_x), min(height, y2 + pad_y)
+        crop = frame[y1:y2, x1:x2]
+        scale = self.max_size / max(crop.shape[:2])
+        if scale < 1:
+            return cv2.resize(crop, (max(1, int(crop.shape[1] * scale)), max(1, int(crop.shape[0] * scale))),
+                              interpolation=cv2.INTER_AREA)
+        return crop.copy()  # the frame is drawn on afterwards
+
+    def update(self, frame: np.ndarray, detections: FrameDetections, frame_index: int):
+        """Offer this frame's tracked boxes; only crops that beat their track's best are taken"""
+        if not len(detections):
+            return
+        xyxy = detections.xyxy
+        if self.mode == "confidence":
+            scores = detections.conf
+        else:
+            scores = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+        for pid, score, box, conf in zip(detections.ids.tolist(), scores.tolist(), xyxy.tolist(),
+                                         detections.conf.tolist()):
+            best = self.tracks.get(pid)
+            if best is not None and score <= best["score"]:
+                continue
+            x1, y1, x2, y2 = box
+            if x2 <= x1 or y2 <= y1:
+                continue
+            crop = self._crop(frame, box)
+            self._pending[pid] = crop
+            self.tracks[pid] = {
+                "file": self.filename(pid),
+                "frame": frame_index,
+                "time_s": round(frame_index / self.fps, 3) if self.fps else None,
+                "conf": round(conf, 4),
+                "bbox": box,
+                "score": score,
+                "width": crop.shape[1],
+                "height": crop.shape[0],
+            }
+
+    def flush(self, active_ids: Optional[Iterable[int]] = None):
+        """Write crops of tracks that are no longer active (all of them if active_ids is None)"""
+        active = set(active_ids) if active_ids is not None else set()
+        for pid in [pid for pid in self._pending if pid not in active]:
+            ok, buf = cv2.imencode("." + self.fmt, self._pending.pop(pid), [THUMBNAIL_FORMATS[self.fmt], self.quality])
+            if not ok:
+                continue
+            # Replace atomically: the endpoint may be serving the previous crop
+            path = os.path.join(self.output_dir, self.filename(pid))
+            with open(path + ".tmp", "wb") as f:
+                f.write(buf.tobytes())
+            os.replace(path + ".tmp", path)
+            self._written[pid] = self.tracks[pid]
+        self.write_index()
+
+    def write_index(self):
+        index = {
+            "mode": self.mode,
+            "format": self.fmt,
+            "tracks": {str(pid): {k: v for k, v in info.items() if k != "score"}
+                       for pid, info in sorted(self._written.items())},
+        }
+        path = os.path.join(self.output_dir, THUMBNAIL_INDEX)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def to_dict(self) -> Dict:
+        """Checkpoint state; call after flush() so every crop is already on disk"""
+        return {"tracks": {str(pid): info for pid, info in self.tracks.items()}}
+
+    def load_dict(self, data: Dict):
+        self.tracks = {int(pid): info for pid, info in data["tracks"].items()}
+        self._written = dict(self.tracks)
+        self._pending = {}
+
+
+def load_thumbnail_index(output_dir: str) -> Optional[Dict]:
+    path = os.path.join(output_dir, THUMBNAIL_INDEX)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return None
@@ -0,0 +1,210 @@
+from typing import Dict, Iterator, Sequence, Tuple, Union
+
+import numpy as np
+
+
+class FrameDetections:
+    """
+    Compact, array-backed detections for one frame.
+
+    xyxy: (N, 4) int32 pixel boxes, conf: (N,) float32, cls: (N,) int16,
+    ids: (N,) int32 track ids once the frame has been through PotholeTracker
+    (-1 before that).
+    """
+    __slots__ = ("xyxy", "conf", "cls", "ids")
+
+    def __init__(self, xyxy=None, conf=None, cls=None, ids=None):
+        self.xyxy = np.ascontiguousarray(xyxy, dtype=np.int32).reshape(-1, 4) if xyxy is not None \
+            else np.empty((0, 4), np.int32)
+        n = len(self.xyxy)
+        self.conf = np.asarray(conf, dtype=np.float32) if conf is not None else np.ones(n, np.float32)
+        self.cls = np.asarray(cls, dtype=np.int16) if cls is not None else np.zeros(n, np.int16)
+        self.ids = np.asarray(ids, dtype=np.int32) if ids is not None else np.full(n, -1, np.int32)
+
+    @classmethod
+    def from_boxes(cls, boxes) -> "FrameDetections":
+        """
+        Build from an Ultralytics `Boxes` object with a single device->host
+        transfer of its (N, 6) [x1, y1, x2, y2, conf, cls] tensor.
+        """
+        if boxes is None or len(boxes) == 0:
+            return cls()
+        data = boxes.data.cpu().numpy()
+        # astype truncates toward zero, same as the previous int() per coordinate
+        return cls(data[:, :4].astype(np.int32), data[:, 4], data[:, 5])
+
+    @classmethod
+    def from_any(cls, detections: Union["FrameDetections", Sequence[Tuple[int, int, int, int]]]) -> "FrameDetections":
+        if isinstance(detections, FrameDetections):
+            return detections
+        return cls(np.asarray(detections, dtype=np.int32).reshape(-1, 4) if len(detections) else None)
+
+    def __len__(self) -> int:
+        return len(self.xyxy)
+
+    def offset(self, dx: int, dy: int) -> "FrameDetections":
+        """Shift boxes in place, e.g. from crop to full-frame coordinates"""
+        if dx or dy:
+            self.xyxy += np.array([dx, dy, dx, dy], np.int32)
+        return self
+
+    def tracked(self) -> Iterator[Tuple[int, Tuple[int, int, int, int]]]:
+        """(track_id, (x1, y1, x2, y2)) pairs as plain ints, for drawing/serialising"""
+        for pid, box in zip(self.ids.tolist(), self.xyxy.tolist()):
+            yield pid, tuple(box)
+
+    def to_dict(self) -> Dict:
+        return {
+            "ids": self.ids.tolist(),
+            "xyxy": self.xyxy.tolist(),
+            "conf": [round(c, 4) for c in self.conf.tolist()],
+            "cls": self.cls.tolist(),
+        }
+
+
+def merge_fragments(xyxy: np.ndarray, scores: np.ndarray, ios_threshold: float = 0.6) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Greedy merge by intersection-over-smaller: a box mostly inside a
+    higher-scoring one (e.g. the half of a pothole a tile edge cut off)
+    is folded into it, and the kept box grows to cover both. Returns
+    (kept indices, merged (K, 4) boxes).
+    """
+    if len(xyxy) == 0:
+        return np.empty(0, np.int64), np.empty((0, 4), np.float64)
+    boxes = xyxy.astype(np.float64)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = np.argsort(-scores, kind="stable")
+    keep, merged = [], []
+    while len(order):
+        best, rest = order[0], order[1:]
+        box = boxes[best].copy()
+        if len(rest):
+            inter_w = np.clip(np.minimum(box[2], boxes[rest, 2]) - np.maximum(box[0], boxes[rest, 0]), 0, None)
+            inter_h = np.clip(np.minimum(box[3], boxes[rest, 3]) - np.maximum(box[1], boxes[rest, 1]), 0, None)
+            smaller = np.minimum(areas[best], areas[rest])
+            ios = np.zeros(len(rest), np.float64)
+            np.divide(inter_w * inter_h, smaller, out=ios, where=smaller > 0)
+            absorbed = rest[ios > ios_threshold]
+            if len(absorbed):
+                box[:2] = np.minimum(box[:2], boxes[absorbed, :2].min(axis=0))
+                box[2:] = np.maximum(box[2:], boxes[absorbed, 2:].max(axis=0))
+            rest = rest[ios <= ios_threshold]
+        keep.append(best)
+        merged.append(box)
+        order = rest
+    return np.asarray(keep, np.int64), np.asarray(merged, np.float64)
+
+
+class PotholeTracker:
+    """Simple tracker to count unique potholes and avoid duplicates"""
+    def __init__(self, iou_threshold=0.5, max_disappeared=10):
+        self.next_id = 0
+        self.iou_threshold = iou_threshold
+        self.max_disappeared = max_disappeared
+        # Active tracks as parallel arrays, ordered by id (oldest first)
+        self.ids = np.empty(0, np.int32)
+        self.boxes = np.empty((0, 4), np.float64)
+        self.disappeared = np.empty(0, np.int32)
+
+    @property
+    def tracked_potholes(self) -> Dict[int, Dict]:
+        """Dict view of active tracks: {id: {'bbox': (x1, y1, x2, y2), 'disappeared': n}}"""
+        return {
+            pid: {'bbox': tuple(int(v) for v in box), 'disappeared': int(gone)}
+            for pid, box, gone in zip(self.ids.tolist(), self.boxes, self.disappeared.tolist())
+        }
+
+    def calculate_iou(self, box1, box2):
+        """Calculate Intersection over Union"""
+        return float(self.iou_one_to_many(np.asarray(box1, np.float64), np.asarray(box2, np.float64)[None])[0])
+
+    @staticmethod
+    def iou_one_to_many(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+        """IoU of one (4,) box against (M, 4) boxes"""
+        inter_w = np.clip(np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0, None)
+        inter_h = np.clip(np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0, None)
+        inter_area = inter_w * inter_h
+
+        box_area = (box[2] - box[0]) * (box[3] - box[1])
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        union_area = box_area + areas - inter_area
+
+        iou = np.zeros(len(boxes), np.float64)
+        np.divide(inter_area, union_area, out=iou, where=union_area > 0)
+        return iou
+
+    def update(self, detections) -> FrameDetections:
+        """
+        Update tracker with new detections (FrameDetections or (x1, y1, x2, y2)
+        tuples). Returns the frame's FrameDetections with `ids` filled in.
+
+        Matching is greedy in detection order against the best-IoU track,
+        exactly as before; only the IoU computation is vectorised.
+        """
+        frame = FrameDetections.from_any(detections)
+        self.disappeared += 1
+
+        ids = np.empty(len(frame), np.int32)
+        new_ids, new_boxes = [], []
+        for i, box in enumerate(frame.xyxy.astype(np.float64)):
+            # Tracks created earlier in this frame are candidates too
+            if new_ids:
+                self._append_tracks(new_ids, new_boxes)
+                new_ids, new_boxes = [], []
+
+            best = -1
+            if len(self.ids):
+                iou = self.iou_one_to_many(box, self.boxes)
+                candidate = int(np.argmax(iou))  # first max = lowest id, as dict order did
+                if iou[candidate] > self.iou_threshold:
+                    best = candidate
+
+            if best >= 0:
+                self.boxes[best] = box
+                self.disappeared[best] = 0
+                ids[i] = self.ids[best]
+            else:
+                ids[i] = self.next_id
+                new_ids.append(self.next_id)
+                new_boxes.append(box)
+                self.next_id += 1
+
+        if new_ids:
+            self._append_tracks(new_ids, new_boxes)
+
+        keep = self.disappeared <= self.max_disappeared
+        if not keep.all():
+            self.ids = self.ids[keep]
+            self.boxes = self.boxes[keep]
+            self.disappeared = self.disappeared[keep]
+
+        frame.ids = ids
+        return frame
+
+    def _append_tracks(self, new_ids, new_boxes):
+        self.ids = np.concatenate([self.ids, np.asarray(new_ids, np.int32)])
+        self.boxes = np.concatenate([self.boxes, np.asarray(new_boxes, np.float64).reshape(-1, 4)])
+        self.disappeared = np.concatenate([self.disappeared, np.zeros(len(new_ids), np.int32)])
+
+    def get_total_count(self):
+        return self.next_id
+
+    def to_dict(self) -> Dict:
+        """Full state (JSON-safe) for checkpoints; boxes are whole pixels, so lossless"""
+        return {
+            "next_id": self.next_id,
+            "iou_threshold": self.iou_threshold,
+            "max_disappeared": self.max_disappeared,
+            "ids": self.ids.tolist(),
+            "boxes": self.boxes.tolist(),
+            "disappeared": self.disappeared.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PotholeTracker":
+        tracker = cls(iou_threshold=data["iou_threshold"], max_disappeared=data["max_disappeared"])
+        tracker.next_id = data["next_id"]
+        tracker.ids = np.asarray(data["ids"], np.int32)
+        tracker.boxes = np.asarray(data["boxes"], np.float64).reshape(-1, 4)
+        tracker.disappeared = np.asarray(data["disappeared"], np.int32)
+        return tracker
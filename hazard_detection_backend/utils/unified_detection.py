@@ -5,99 +5,56 @@ from pathlib import Path
 import logging
 from collections import defaultdict
 from ultralytics import YOLO
-from typing import Tuple, List, Dict
+from typing import Callable, Tuple, List, Dict, Union
 import math
 import time
 import torch
 
+from utils.video_io import (
+    open_video_reader, open_video_writer, open_hls_writer, remux_to_mp4, concat_to_mp4,
+    hls_segment_frames, hls_segments, read_hls_playlist, restore_hls_stream, end_hls_playlist,
+    DEFAULT_PRESET, DEFAULT_CRF, HLS_PLAYLIST
+)
+from utils.checkpoint import JobCheckpoint, source_fingerprint, DEFAULT_CHECKPOINT_INTERVAL
+from utils.thumbnails import ThumbnailCollector
+from utils.metrics import METRICS, StageTimer, peak_rss_bytes
+from utils.tracking import FrameDetections, PotholeTracker, merge_fragments
+from utils.roi import RoadROI, ROICalibrator, load_camera_roi, save_camera_roi
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")  # camera profiles (road ROI) live next to detections.json
 MODEL_PATH = os.path.join("model", "best.pt")
 if not os.path.exists(MODEL_PATH):
     raise FileNotFoundError(f"Model missing at {MODEL_PATH}. Place best.pt there.")
 
 # 🚀 GPU Setup
+# Only the availability check runs at import: querying the device creates a
+# CUDA context, which would break workers forked after a preload (gunicorn).
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-if DEVICE == "cuda":
-    logger.info(f"🎮 GPU DETECTED: {torch.cuda.get_device_name(0)}")
-    logger.info(f"   Memory: {torch.cuda.get_device_properties(0).total_memory / 1024**3:.1f} GB")
-else:
+if DEVICE != "cuda":
     logger.warning("⚠️  No GPU detected, using CPU (will be slower)")
 
+_load_start = time.perf_counter()
 MODEL = YOLO(MODEL_PATH)
+MODEL_LOAD_SECONDS = time.perf_counter() - _load_start
+METRICS.set("hazard_model_load_seconds", MODEL_LOAD_SECONDS)
+logger.info(f"📦 Model loaded in {MODEL_LOAD_SECONDS:.2f}s")
+
+# Finished tracks' thumbnails are written this often (frames), so they can be viewed mid-job
+THUMBNAIL_FLUSH_FRAMES = 150
+
+# Inference sizes YOLO accepts (multiples of 32) for imgsz="auto"
+INFERENCE_SIZES = (320, 416, 512, 640, 768, 960, 1280)
+_reference_latency_ms = {}
 
 # Load face and plate cascades
 FACE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
 PLATE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_russian_plate_number.xml')
 
 
-class PotholeTracker:
-    """Simple tracker to count unique potholes and avoid duplicates"""
-    def __init__(self, iou_threshold=0.5, max_disappeared=10):
-        self.next_id = 0
-        self.tracked_potholes = {}
-        self.iou_threshold = iou_threshold
-        self.max_disappeared = max_disappeared
-        
-    def calculate_iou(self, box1, box2):
-        """Calculate Intersection over Union"""
-        x1_min, y1_min, x1_max, y1_max = box1
-        x2_min, y2_min, x2_max, y2_max = box2
-        
-        inter_x_min = max(x1_min, x2_min)
-        inter_y_min = max(y1_min, y2_min)
-        inter_x_max = min(x1_max, x2_max)
-        inter_y_max = min(y1_max, y2_max)
-        
-        inter_area = max(0, inter_x_max - inter_x_min) * max(0, inter_y_max - inter_y_min)
-        
-        box1_area = (x1_max - x1_min) * (y1_max - y1_min)
-        box2_area = (x2_max - x2_min) * (y2_max - y2_min)
-        union_area = box1_area + box2_area - inter_area
-        
-        return inter_area / union_area if union_area > 0 else 0
-    
-    def update(self, detections: List[Tuple[int, int, int, int]]):
-        """Update tracker with new detections"""
-        for pid in list(self.tracked_potholes.keys()):
-            self.tracked_potholes[pid]['disappeared'] += 1
-            
-        current_frame_potholes = []
-        
-        for detection in detections:
-            best_match_id = None
-            best_iou = 0
-            
-            for pid, track in self.tracked_potholes.items():
-                iou = self.calculate_iou(detection, track['bbox'])
-                if iou > self.iou_threshold and iou > best_iou:
-                    best_iou = iou
-                    best_match_id = pid
-            
-            if best_match_id is not None:
-                self.tracked_potholes[best_match_id]['bbox'] = detection
-                self.tracked_potholes[best_match_id]['disappeared'] = 0
-                current_frame_potholes.append((best_match_id, detection))
-            else:
-                new_id = self.next_id
-                self.next_id += 1
-                self.tracked_potholes[new_id] = {
-                    'bbox': detection,
-                    'disappeared': 0
-                }
-                current_frame_potholes.append((new_id, detection))
-        
-        for pid in list(self.tracked_potholes.keys()):
-            if self.tracked_potholes[pid]['disappeared'] > self.max_disappeared:
-                del self.tracked_potholes[pid]
-        
-        return current_frame_potholes
-    
-    def get_total_count(self):
-        return self.next_id
-
-
 def calculate_distance_haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Calculate distance between two GPS coordinates in kilometers"""
     R = 6371
@@ -157,6 +114,152 @@ def draw_overlay(frame, pothole_count: int, total_potholes: int, distance_km: fl
     return frame
 
 
+def detect_potholes(frame, conf: float = 0.25, device: str = DEVICE,
+                    timer: StageTimer = None, imgsz: int = 640) -> FrameDetections:
+    """Run YOLO on one BGR frame and return its pothole boxes, confidences and classes"""
+    t = time.perf_counter()
+    results = MODEL.predict(
+        source=frame,
+        conf=conf,  # High sensitivity
+        imgsz=imgsz,  # 640 = full size for best detection
+        device=device,  # 🚀 GPU acceleration
+        half=True if device == "cuda" else False,  # 🚀 FP16 for 2x speed on GPU
+        verbose=False
+    )
+    if timer is not None:
+        t = timer.record("predict", t)
+    
+    # One device->host copy for all boxes instead of one per box
+    detections = FrameDetections.from_boxes(results[0].boxes if len(results) > 0 else None)
+    if timer is not None:
+        timer.record("extract", t)
+    return detections
+
+
+def estimate_predict_ms(imgsz: int, device: str = DEVICE) -> float:
+    """
+    Predicted YOLO latency at imgsz, scaled by pixel count from one timed
+    640px inference on this device (measured once, then cached).
+    """
+    if device not in _reference_latency_ms:
+        dummy_frame = np.zeros((640, 640, 3), dtype=np.uint8)
+        MODEL.predict(source=dummy_frame, imgsz=640, device=device, verbose=False)
+        t = time.perf_counter()
+        MODEL.predict(source=dummy_frame, imgsz=640, device=device, verbose=False)
+        _reference_latency_ms[device] = (time.perf_counter() - t) * 1000
+    return _reference_latency_ms[device] * (imgsz / 640) ** 2
+
+
+def select_inference_size(width: int, height: int, latency_budget_ms: float = None,
+                          device: str = DEVICE) -> int:
+    """
+    Pick imgsz from the source resolution: the largest standard size not
+    above the frame's long side (no upsampling of low-res clips), then step
+    down until the estimated per-frame latency fits the budget.
+    """
+    longest = max(width, height)
+    sizes = [size for size in INFERENCE_SIZES if size <= longest] or [INFERENCE_SIZES[0]]
+    if latency_budget_ms:
+        while len(sizes) > 1 and estimate_predict_ms(sizes[-1], device) > latency_budget_ms:
+            sizes.pop()
+    return sizes[-1]
+
+
+def tile_grid(width: int, height: int, tile_size: int, overlap: float = 0.2) -> List[Tuple[int, int, int, int]]:
+    """Overlapping (x1, y1, x2, y2) tiles covering width x height; edge tiles are shifted inwards"""
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        stride = max(1, int(tile_size * (1 - overlap)))
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+    
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height) for x in starts(width)
+    ]
+
+
+def detect_potholes_tiled(frame, conf: float = 0.25, device: str = DEVICE, timer: StageTimer = None,
+                          imgsz: int = 640, region_top: float = 0.4, tile_size: int = 960,
+                          overlap: float = 0.2, merge_ios: float = 0.6,
+                          full_frame: bool = True, roi: RoadROI = None) -> FrameDetections:
+    """
+    Sliced inference over the road region: `roi` if given, otherwise the
+    frame below `region_top`.
+    
+    Each tile is predicted at `imgsz`, so a 960px tile of a 4K frame is only
+    downscaled 1.5x instead of 6x, and small distant potholes survive. A
+    full-frame pass (at the same imgsz) keeps large, near potholes that
+    straddle tiles. Tile boxes are shifted back to frame coordinates and
+    merged by intersection-over-smaller, so the fragment of a pothole that
+    a tile edge cut off folds into the whole box instead of surviving IoU
+    NMS and being counted as a second pothole.
+    """
+    height, width = frame.shape[:2]
+    if roi is not None:
+        region, (x_offset, y_offset) = roi.crop(frame)
+    else:
+        x_offset, y_offset = 0, int(height * region_top)
+        region = frame[y_offset:]
+        roi = RoadROI.lower_fraction(region_top)
+    tiles = tile_grid(region.shape[1], region.shape[0], tile_size, overlap)
+    crops = [region[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+    
+    t = time.perf_counter()
+    # One batched call for all tiles
+    results = MODEL.predict(
+        source=crops,
+        conf=conf,
+        imgsz=imgsz,
+        device=device,
+        half=True if device == "cuda" else False,
+        verbose=False
+    )
+    if full_frame:
+        # Coarse pass over the whole road region (not the whole frame)
+        results = list(results) + list(MODEL.predict(
+            source=region, conf=conf, imgsz=imgsz, device=device,
+            half=True if device == "cuda" else False, verbose=False
+        ))
+    if timer is not None:
+        t = timer.record("predict", t)
+    
+    offsets = [(x_offset + x1, y_offset + y1) for x1, y1, _, _ in tiles]
+    if full_frame:
+        offsets.append((x_offset, y_offset))
+    parts = []
+    for result, (dx, dy) in zip(results, offsets):
+        if result.boxes is None or len(result.boxes) == 0:
+            continue
+        data = result.boxes.data.cpu().numpy()
+        data[:, [0, 2]] += dx
+        data[:, [1, 3]] += dy
+        parts.append(data)
+    
+    if not parts:
+        detections = FrameDetections()
+    else:
+        merged = np.concatenate(parts)
+        keep, boxes = merge_fragments(merged[:, :4], merged[:, 4], merge_ios)
+        detections = FrameDetections(boxes.astype(np.int32), merged[keep, 4], merged[keep, 5])
+    if timer is not None:
+        timer.record("extract", t)
+    return detections
+
+
+def warmup_model(device: str = DEVICE):
+    """Run one dummy inference so the first real frame isn't slowed by CUDA init"""
+    if device == "cuda":
+        logger.info(f"🎮 GPU: {torch.cuda.get_device_name(0)} "
+                    f"({torch.cuda.get_device_properties(0).total_memory / 1024**3:.1f} GB)")
+        logger.info("🔥 Warming up GPU...")
+        dummy_frame = np.zeros((640, 640, 3), dtype=np.uint8)
+        MODEL.predict(source=dummy_frame, imgsz=640, device=device, verbose=False)
+        logger.info("✅ GPU ready!")
+
+
 def process_video_unified(
     source_path: str,
     output_path: str,
@@ -165,7 +268,29 @@ def process_video_unified(
     end_lat: float = None,
     end_lon: float = None,
     conf: float = 0.25,
-    use_gpu: bool = True
+    use_gpu: bool = True,
+    video_backend: str = "auto",
+    encode_preset: str = DEFAULT_PRESET,
+    encode_crf: int = DEFAULT_CRF,
+    output_max_height: int = None,
+    stream_dir: str = None,
+    progress_callback: Callable[[Dict], None] = None,
+    progress_interval: float = 0.5,
+    imgsz: Union[int, str] = 640,
+    latency_budget_ms: float = None,
+    tiled: bool = False,
+    tile_region_top: float = 0.4,
+    tile_size: int = 960,
+    road_roi: Union[RoadROI, str] = None,
+    camera_profile: str = None,
+    roi_calibration_frames: int = 30,
+    roi_cascades: bool = False,
+    checkpoint_dir: str = None,
+    checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+    thumbnails_dir: str = None,
+    thumbnail_mode: str = "confidence",
+    thumbnail_format: str = "jpg",
+    thumbnail_size: int = 256
 ) -> Dict:
     """
     🚀 GPU-OPTIMIZED unified video processing
@@ -181,6 +306,51 @@ def process_video_unified(
     - FP16 precision (2x faster)
     - Lighter blur (3x faster)
     - H.264 codec (2x faster)
+    - PyAV / FFmpeg-pipe I/O with threaded codecs (video_backend="auto")
+    
+    VIDEO I/O:
+    - video_backend: "auto" | "pyav" | "ffmpeg" | "opencv"
+    - encode_preset / encode_crf: libx264 speed vs size trade-off
+    - output_max_height: downscale the encoded output (e.g. 720)
+    - stream_dir: write HLS segments there while processing (served live),
+      then remux them into output_path at the end
+    
+    INFERENCE RESOLUTION:
+    - imgsz=640 (default) or "auto": chosen from the source resolution
+      (the tile size when tiled) and latency_budget_ms (see
+      select_inference_size)
+    - tiled=True: sliced inference over the road region below
+      tile_region_top, tile-edge fragments merged into whole boxes
+      (better small-pothole recall on 4K)
+    
+    ROAD ROI:
+    - road_roi: RoadROI (static polygon / lower band) or "auto" to estimate
+      it from the first roi_calibration_frames frames
+    - camera_profile: load the ROI stored for this camera, or save the
+      auto-calibrated one under this name (data/camera_profiles.json)
+    - YOLO then only sees the ROI crop; roi_cascades=True also limits the
+      face/plate cascades to it (off by default: privacy blur stays full-frame)
+    
+    THUMBNAILS:
+    - thumbnails_dir: save the best crop of every pothole track there
+      (track_<id>.jpg/.webp + index.json), picked by thumbnail_mode
+      "confidence" or "area", at most thumbnail_size px; crops are taken
+      after privacy blur and before boxes/overlay are drawn
+    
+    CHECKPOINT / RESUME:
+    - checkpoint_dir: encode the output as segments closed every
+      checkpoint_interval frames and save frame index, tracker state and
+      timings with each one. Calling again with the same arguments after a
+      crash seeks to the last checkpoint and continues; stats and output
+      match an uninterrupted run.
+    - with stream_dir, the HLS stream itself is the segmented output: the
+      interval is rounded up to whole HLS segments, the writer is closed on
+      that segment boundary at each checkpoint, and a resume rolls the
+      playlist back to it and appends from there.
+    
+    PROGRESS:
+    - progress_callback(dict) is called at most every progress_interval
+      seconds with frames done, fps, ETA and the running pothole count
     
     Total speedup: ~60x faster with NO accuracy loss!
     """
@@ -190,33 +360,123 @@ def process_video_unified(
     device = DEVICE if use_gpu else "cpu"
     logger.info(f"🎮 Using device: {device}")
     
-    cap = cv2.VideoCapture(source_path)
-    if not cap.isOpened():
-        raise RuntimeError(f"Cannot open video: {source_path}")
+    checkpoint = None
+    resume = None
+    if checkpoint_dir:
+        checkpoint = JobCheckpoint(checkpoint_dir, source_fingerprint(
+            source_path, start_lat=start_lat, start_lon=start_lon, end_lat=end_lat, end_lon=end_lon,
+            conf=conf, device=device, video_backend=video_backend, encode_preset=encode_preset,
+            encode_crf=encode_crf, output_max_height=output_max_height, imgsz=imgsz,
+            latency_budget_ms=latency_budget_ms, tiled=tiled, tile_region_top=tile_region_top,
+            tile_size=tile_size, road_roi=road_roi.to_dict() if isinstance(road_roi, RoadROI) else road_roi,
+            camera_profile=camera_profile, roi_calibration_frames=roi_calibration_frames,
+            roi_cascades=roi_cascades, checkpoint_interval=checkpoint_interval,
+            thumbnails_dir=thumbnails_dir, thumbnail_mode=thumbnail_mode,
+            thumbnail_format=thumbnail_format, thumbnail_size=thumbnail_size, stream_dir=stream_dir
+        ))
+        resume = checkpoint.load()
+    
+    cap = open_video_reader(source_path, backend=video_backend)
     
     # Get video properties
-    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frame_width = cap.width
+    frame_height = cap.height
+    fps = cap.fps
+    total_frames = cap.frame_count
     
     logger.info(f"📺 Video: {frame_width}x{frame_height} @ {fps:.1f}fps")
     logger.info(f"⏱️  Total frames: {total_frames}")
     logger.info(f"⚙️  Settings: conf={conf}, device={device}")
     
-    # Create output video writer with H.264 codec
-    os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else ".", exist_ok=True)
-    
-    # Try H.264 codec first (faster), fallback to mp4v
-    fourcc = cv2.VideoWriter_fourcc(*'avc1')
-    out = cv2.VideoWriter(output_path, fourcc, fps, (frame_width, frame_height))
-    
-    if not out.isOpened():
-        logger.warning("⚠️  H.264 codec not available, using mp4v")
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (frame_width, frame_height))
-    
-    tracker = PotholeTracker()
+    if checkpoint is not None and stream_dir:
+        # Checkpoint only where the HLS muxer would cut a segment anyway
+        segment_frames_hls = hls_segment_frames(fps)
+        checkpoint_interval = -(-checkpoint_interval // segment_frames_hls) * segment_frames_hls
+    
+    def open_segment_writer(start_frame: int):
+        if stream_dir:
+            # Next link of the HLS chain, continuing at the frame after the checkpoint
+            return open_hls_writer(
+                stream_dir, fps, (frame_width, frame_height),
+                backend=video_backend,
+                preset=encode_preset,
+                crf=encode_crf,
+                max_height=output_max_height,
+                resumable=True,
+                start_frame=start_frame
+            )
+        # Intermediate segments skip faststart; the final concat writes it
+        return open_video_writer(
+            checkpoint.next_segment_path(), fps, (frame_width, frame_height),
+            backend=video_backend,
+            preset=encode_preset,
+            crf=encode_crf,
+            faststart=False,
+            max_height=output_max_height
+        )
+    
+    # Create output video writer (libx264 + faststart when PyAV/ffmpeg is available)
+    try:
+        if checkpoint is not None:
+            if stream_dir:
+                # Drop whatever a crashed run streamed past its last checkpoint
+                restore_hls_stream(stream_dir, resume["hls_playlist"] if resume is not None else None)
+            out = open_segment_writer(resume["frame_num"] if resume is not None else 0)
+        elif stream_dir:
+            out = open_hls_writer(
+                stream_dir, fps, (frame_width, frame_height),
+                backend=video_backend,
+                preset=encode_preset,
+                crf=encode_crf,
+                max_height=output_max_height
+            )
+        else:
+            out = open_video_writer(
+                output_path, fps, (frame_width, frame_height),
+                backend=video_backend,
+                preset=encode_preset,
+                crf=encode_crf,
+                max_height=output_max_height
+            )
+    except Exception:
+        cap.release()
+        raise
+    logger.info(f"🎞️  Video I/O: decode={cap.backend}, encode={out.backend}")
+    
+    if resume is not None:
+        imgsz = resume["imgsz"]  # keep the size picked before the restart
+    elif imgsz == "auto" and tiled:
+        # Each prediction sees one tile, so sizes above tile_size would only upsample it
+        imgsz = select_inference_size(min(frame_width, tile_size), min(frame_height, tile_size),
+                                      latency_budget_ms, device)
+    elif imgsz == "auto":
+        imgsz = select_inference_size(frame_width, frame_height, latency_budget_ms, device)
+    logger.info(f"🔍 Inference: imgsz={imgsz}" + (f", tiled ({tile_size}px tiles below {tile_region_top:.0%})" if tiled else ""))
+    
+    roi = None
+    calibrator = None
+    if resume is not None:
+        # Checkpoints are only taken once calibration is over
+        roi = RoadROI.from_dict(resume["road_roi"]) if resume["road_roi"] else None
+    elif camera_profile and road_roi in (None, "auto"):
+        roi = load_camera_roi(DATA_DIR, camera_profile)
+        if roi is not None:
+            logger.info(f"📐 Road ROI from camera profile '{camera_profile}': {roi.to_dict()['polygon']}")
+    if roi is None and resume is None:
+        if road_roi == "auto":
+            calibrator = ROICalibrator(frames=roi_calibration_frames)
+            logger.info(f"📐 Calibrating road ROI over the first {roi_calibration_frames} frames")
+        elif isinstance(road_roi, RoadROI):
+            roi = road_roi
+    
+    tracker = PotholeTracker.from_dict(resume["tracker"]) if resume is not None else PotholeTracker()
+    
+    thumbnails = None
+    if thumbnails_dir:
+        thumbnails = ThumbnailCollector(thumbnails_dir, mode=thumbnail_mode, fmt=thumbnail_format,
+                                        max_size=thumbnail_size, fps=fps)
+        if resume is not None and resume.get("thumbnails"):
+            thumbnails.load_dict(resume["thumbnails"])
     
     distance_km = 0.0
     if start_lat and start_lon and end_lat and end_lon:
@@ -224,69 +484,120 @@ def process_video_unified(
     
     frame_num = 0
     processed_frames = 0
+    segment_frames = 0
     
+    timer = StageTimer()
     start_time = time.time()
+    next_progress_time = 0.0
+    
+    if resume is not None:
+        frame_num = processed_frames = resume["frame_num"]
+        if os.path.exists(checkpoint.timings_path):
+            timer.load(checkpoint.timings_path)
+        # processing_time keeps counting from where the last run checkpointed
+        start_time -= resume["elapsed_seconds"]
+        cap.seek(frame_num)
+        kept = len(hls_segments(resume["hls_playlist"])) if stream_dir else len(checkpoint.segments)
+        logger.info(f"♻️  Resuming from checkpoint at frame {frame_num}/{total_frames} ({kept} segments kept)")
+    
+    def report_progress(done: bool = False):
+        elapsed = time.time() - start_time
+        fps_processing = processed_frames / elapsed if elapsed > 0 else 0
+        remaining = max(total_frames - frame_num, 0)
+        progress_callback({
+            "frames_done": frame_num,
+            "total_frames": total_frames,
+            "percent": round(frame_num / total_frames * 100, 1) if total_frames > 0 else None,
+            "fps": round(fps_processing, 2),
+            "eta_seconds": 0 if done else (round(remaining / fps_processing, 1) if fps_processing > 0 and total_frames > 0 else None),
+            "potholes": tracker.get_total_count(),
+            "elapsed_seconds": round(elapsed, 1),
+            "done": done
+        })
     
     # Warm up GPU
-    if device == "cuda":
-        logger.info("🔥 Warming up GPU...")
-        dummy_frame = np.zeros((640, 640, 3), dtype=np.uint8)
-        MODEL.predict(source=dummy_frame, imgsz=640, device=device, verbose=False)
-        logger.info("✅ GPU ready!")
+    warmup_model(device)
     
     try:
         while True:
+            t = time.perf_counter()
             ret, frame = cap.read()
             if not ret:
                 break
+            timer.record("decode", t)
             
             frame_num += 1
             
             # === STEP 1: YOLO Pothole Detection with GPU ===
-            results = MODEL.predict(
-                source=frame,
-                conf=conf,  # High sensitivity
-                imgsz=640,  # Full size for best detection
-                device=device,  # 🚀 GPU acceleration
-                half=True if device == "cuda" else False,  # 🚀 FP16 for 2x speed on GPU
-                verbose=False
-            )
+            if tiled:
+                detections = detect_potholes_tiled(
+                    frame, conf=conf, device=device, timer=timer, imgsz=imgsz,
+                    region_top=tile_region_top, tile_size=tile_size, roi=roi
+                )
+            elif roi is not None:
+                # YOLO only sees the road crop; boxes go back to frame coordinates
+                crop, (dx, dy) = roi.crop(frame)
+                detections = detect_potholes(crop, conf=conf, device=device, timer=timer, imgsz=imgsz).offset(dx, dy)
+            else:
+                detections = detect_potholes(frame, conf=conf, device=device, timer=timer, imgsz=imgsz)
             
-            # Extract detections
-            detections = []
-            if len(results) > 0 and results[0].boxes is not None:
-                boxes = results[0].boxes
-                for box in boxes:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
-                    detections.append((x1, y1, x2, y2))
+            if calibrator is not None:
+                calibrator.add(frame, detections.xyxy)
+                if calibrator.done:
+                    roi = calibrator.result()
+                    calibrator = None
+                    logger.info(f"📐 Road ROI calibrated: {roi.to_dict()['polygon']} "
+                               f"({roi.pixel_fraction(frame_width, frame_height):.0%} of pixels)")
+                    if camera_profile:
+                        save_camera_roi(DATA_DIR, camera_profile, roi)
             
             # === STEP 2: Track Potholes ===
+            t = time.perf_counter()
             tracked_potholes = tracker.update(detections)
+            t = timer.record("track", t)
             
-            # === STEP 3: Draw pothole boxes ===
-            for pid, (x1, y1, x2, y2) in tracked_potholes:
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
-                label = f"Pothole #{pid}"
-                label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-                cv2.rectangle(frame, (x1, y1 - label_size[1] - 10), 
-                             (x1 + label_size[0], y1), (0, 0, 255), -1)
-                cv2.putText(frame, label, (x1, y1 - 5), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            # === STEP 4: Blur Faces (optimized) ===
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            # === STEP 3: Blur Faces (optimized) ===
+            # Privacy blur runs on the clean frame, before any boxes are drawn,
+            # so thumbnails taken below are already blurred
+            cascade_dx, cascade_dy = 0, 0
+            if roi_cascades and roi is not None:
+                rx1, cascade_dy, rx2, ry2 = roi.bounding_rect(frame_width, frame_height)
+                cascade_dx = rx1
+                gray = cv2.cvtColor(frame[cascade_dy:ry2, rx1:rx2], cv2.COLOR_BGR2GRAY)
+            else:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             faces = FACE_CASCADE.detectMultiScale(gray, 1.3, 5)
             if len(faces) > 0:  # Only blur if faces detected
                 for (x, y, w, h) in faces:
-                    frame = blur_region(frame, x, y, w, h)
+                    frame = blur_region(frame, x + cascade_dx, y + cascade_dy, w, h)
+            t = timer.record("face", t)
             
-            # === STEP 5: Blur License Plates (optimized) ===
+            # === STEP 4: Blur License Plates (optimized) ===
             plates = PLATE_CASCADE.detectMultiScale(gray, 1.1, 4)
             if len(plates) > 0:  # Only blur if plates detected
                 for (x, y, w, h) in plates:
-                    frame = blur_region(frame, x, y, w, h)
+                    frame = blur_region(frame, x + cascade_dx, y + cascade_dy, w, h)
+            t = timer.record("plate", t)
+            
+            # === STEP 5: Best crop per track (blurred, no annotations) ===
+            if thumbnails is not None:
+                thumbnails.update(frame, tracked_potholes, frame_num - 1)
+                if frame_num % THUMBNAIL_FLUSH_FRAMES == 0:
+                    thumbnails.flush(active_ids=tracker.ids.tolist())
+                t = timer.record("thumbnail", t)
+            
+            # === STEP 6: Draw pothole boxes ===
+            for pid, (x1, y1, x2, y2) in tracked_potholes.tracked():
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
+                label = f"Pothole #{pid}"
+                label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+                cv2.rectangle(frame, (x1, y1 - label_size[1] - 10), 
+                             (x1 + label_size[0], y1), (0, 0, 255), -1)
+                cv2.putText(frame, label, (x1, y1 - 5), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+            t = timer.record("draw", t)
             
-            # === STEP 6: Draw Overlay ===
+            # === STEP 7: Draw Overlay ===
             frame = draw_overlay(
                 frame,
                 pothole_count=len(tracked_potholes),
@@ -296,10 +607,41 @@ def process_video_unified(
                 total_frames=total_frames,
                 fps=fps
             )
+            t = timer.record("overlay", t)
             
             # Write frame
             out.write(frame)
+            timer.record("encode", t)
             processed_frames += 1
+            segment_frames += 1
+            METRICS.inc("hazard_frames_processed_total")
+            
+            # Close the segment and persist state; frame-count based, so runs are reproducible
+            if checkpoint is not None and frame_num % checkpoint_interval == 0 and calibrator is None:
+                out.release()
+                if not stream_dir:
+                    checkpoint.add_segment(checkpoint.next_segment_path())
+                timer.save(checkpoint.timings_path)
+                if thumbnails is not None:
+                    thumbnails.flush()
+                checkpoint.save({
+                    "frame_num": frame_num,
+                    "elapsed_seconds": time.time() - start_time,
+                    "imgsz": imgsz,
+                    "road_roi": roi.to_dict() if roi is not None else None,
+                    "tracker": tracker.to_dict(),
+                    "thumbnails": thumbnails.to_dict() if thumbnails is not None else None,
+                    "hls_playlist": read_hls_playlist(stream_dir) if stream_dir else None
+                })
+                out = open_segment_writer(frame_num)
+                segment_frames = 0
+            
+            # Progress events for clients (time-throttled; one clock read per frame)
+            if progress_callback is not None:
+                now = time.time()
+                if now >= next_progress_time:
+                    next_progress_time = now + progress_interval
+                    report_progress()
             
             # Progress logging with GPU memory usage
             if frame_num % 100 == 0:
@@ -314,7 +656,7 @@ def process_video_unified(
                     gpu_mem = f"| GPU: {mem_used:.0f}MB/{mem_reserved:.0f}MB"
                 
                 logger.info(f"📊 {frame_num}/{total_frames} frames "
-                           f"({frame_num/total_frames*100:.1f}%) | "
+                           f"({frame_num/max(total_frames, 1)*100:.1f}%) | "
                            f"Speed: {fps_processing:.1f} fps | "
                            f"ETA: {eta:.0f}s {gpu_mem}")
     
@@ -326,7 +668,37 @@ def process_video_unified(
         if device == "cuda":
             torch.cuda.empty_cache()
     
+    if stream_dir:
+        if checkpoint is not None:
+            end_hls_playlist(stream_dir)
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        remux_to_mp4(os.path.join(stream_dir, HLS_PLAYLIST), output_path, backend=out.backend)
+        if checkpoint is not None:
+            checkpoint.clear()
+    elif checkpoint is not None:
+        last_segment = checkpoint.next_segment_path()
+        if segment_frames > 0:
+            checkpoint.add_segment(last_segment)
+        elif os.path.exists(last_segment):
+            os.remove(last_segment)  # clip ended exactly on a checkpoint
+        if checkpoint.segments:
+            concat_to_mp4(checkpoint.segment_paths, output_path, backend=out.backend)
+        checkpoint.clear()
+    
+    if thumbnails is not None:
+        thumbnails.flush()
+    
+    # Clip shorter than the calibration window: use what was seen
+    if calibrator is not None and calibrator.seen > 1:
+        roi = calibrator.result()
+        if camera_profile:
+            save_camera_roi(DATA_DIR, camera_profile, roi)
+    
     total_time = time.time() - start_time
+    METRICS.set("hazard_processing_fps", processed_frames / total_time if total_time > 0 else 0)
+    
+    if progress_callback is not None:
+        report_progress(done=True)
     
     stats = {
         "total_potholes": tracker.get_total_count(),
@@ -336,7 +708,18 @@ def process_video_unified(
         "output_path": output_path,
         "processing_time": total_time,
         "processing_fps": processed_frames / total_time if total_time > 0 else 0,
-        "device_used": device
+        "device_used": device,
+        "imgsz": imgsz,
+        "tiled": tiled,
+        "road_roi": roi.to_dict() if roi is not None else None,
+        "roi_pixel_fraction": round(roi.pixel_fraction(frame_width, frame_height), 3) if roi is not None else 1.0,
+        "thumbnails": len(thumbnails.tracks) if thumbnails is not None else 0,
+        "thumbnails_dir": thumbnails_dir,
+        "video_backend": out.backend,
+        "output_size_bytes": os.path.getsize(output_path) if os.path.exists(output_path) else 0,
+        "stage_timings": timer.summary(),
+        "model_load_seconds": MODEL_LOAD_SECONDS,
+        "peak_rss_mb": round(peak_rss_bytes() / 1024**2, 1)
     }
     
     logger.info(f"\n{'='*60}")
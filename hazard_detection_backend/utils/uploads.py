@@ -0,0 +1,67 @@
+import time
+import socket
+
+from werkzeug.exceptions import RequestTimeout
+
+
+class DeadlineInput:
+    """
+    Wraps environ["wsgi.input"] so the whole request body must arrive within
+    `timeout` seconds, else RequestTimeout (408).
+
+    Under gunicorn the raw socket's timeout is narrowed to the time left
+    before every read, so a client that stops sending cannot park the
+    thread in recv(); elsewhere the deadline is checked between reads.
+    """
+    def __init__(self, environ: dict, timeout: float):
+        self.stream = environ["wsgi.input"]
+        self.deadline = time.monotonic() + timeout
+        self.sock = environ.get("gunicorn.socket")
+        self._sock_timeout = self.sock.gettimeout() if self.sock is not None else None
+        self.timed_out = False
+        environ["wsgi.input"] = self
+
+    def _remaining(self) -> float:
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            self._expire()
+        if self.sock is not None:
+            self.sock.settimeout(remaining)
+        return remaining
+
+    def _expire(self):
+        self.timed_out = True
+        raise RequestTimeout("Upload body not received in time")
+
+    def _call(self, method, *args):
+        self._remaining()
+        try:
+            return method(*args)
+        except socket.timeout:
+            # Raised as HTTPException: werkzeug turns OSError into a 400 "disconnect"
+            self._expire()
+
+    def read(self, size: int = -1) -> bytes:
+        return self._call(self.stream.read, size)
+
+    def readline(self, size: int = -1) -> bytes:
+        return self._call(self.stream.readline, size)
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def close(self):
+        """Restore the socket for the response; after a timeout, stop reading
+        so keep-alive does not block draining the rest of the body"""
+        if self.sock is None:
+            return
+        try:
+            if self.timed_out:
+                self.sock.shutdown(socket.SHUT_RD)
+            self.sock.settimeout(self._sock_timeout)
+        except OSError:
+            pass
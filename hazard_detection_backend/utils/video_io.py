@@ -0,0 +1,628 @@
+import os
+import json
+import shutil
+import logging
+import subprocess
+from fractions import Fraction
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    import av  # PyAV: in-process FFmpeg bindings (optional)
+except ImportError:  # pragma: no cover - optional dependency
+    av = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("pyav", "ffmpeg", "opencv")
+
+# libx264 defaults: browser-playable H.264 + yuv420p, fast to encode, small output
+DEFAULT_PRESET = "veryfast"
+DEFAULT_CRF = 23
+
+# Progressive output: HLS playlist + MPEG-TS segments written while the job runs
+HLS_PLAYLIST = "index.m3u8"
+HLS_SEGMENT_PATTERN = "seg_%05d.ts"
+HLS_ENDLIST = "#EXT-X-ENDLIST"
+DEFAULT_SEGMENT_SECONDS = 2
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+def available_backends():
+    """Backends usable in this environment, fastest first"""
+    backends = []
+    if av is not None:
+        backends.append("pyav")
+    if ffmpeg_available():
+        backends.append("ffmpeg")
+    backends.append("opencv")
+    return backends
+
+
+def resolve_backend(backend: str = "auto") -> str:
+    if backend == "auto":
+        return available_backends()[0]
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown video backend '{backend}'. Choose from {BACKENDS} or 'auto'")
+    if backend not in available_backends():
+        raise RuntimeError(f"Video backend '{backend}' is not available (missing PyAV or ffmpeg binary)")
+    return backend
+
+
+def scaled_size(width: int, height: int, max_height: Optional[int] = None) -> Tuple[int, int]:
+    """Output size for reduced-resolution encoding (even dims, required by yuv420p)"""
+    if max_height and height > max_height:
+        width = int(round(width * max_height / height))
+        height = max_height
+    return width - (width % 2), height - (height % 2)
+
+
+# ----------------- Readers -------------------
+_ROTATE_CODES = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+
+
+def normalize_rotation(degrees) -> int:
+    """Clockwise display rotation snapped to 0/90/180/270 (phone clips carry +-90)"""
+    try:
+        return int(round(float(degrees) / 90)) % 4 * 90
+    except (TypeError, ValueError):
+        return 0
+
+
+def rotate_frame(frame: np.ndarray, rotation: int) -> np.ndarray:
+    code = _ROTATE_CODES.get(rotation)
+    return frame if code is None else cv2.rotate(frame, code)
+
+
+class VideoReader:
+    """
+    Common interface: cv2.VideoCapture-style read() returning BGR frames.
+
+    Frames come out upright, the way OpenCV (auto-orientation on) and
+    players show them: `rotation` is the clockwise turn applied to decoded
+    frames and width/height are the rotated size.
+    """
+    backend = None
+
+    width = 0
+    height = 0
+    fps = 0.0
+    frame_count = 0
+    rotation = 0
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        raise NotImplementedError
+
+    def seek(self, frame_index: int):
+        """
+        Position a freshly opened reader so the next read() returns frame
+        `frame_index` (0-based). Fallback: decode and discard, which is exact
+        for any container.
+        """
+        for _ in range(frame_index):
+            ret, _ = self.read()
+            if not ret:
+                break
+
+    def release(self):
+        pass
+
+    def __iter__(self):
+        while True:
+            ret, frame = self.read()
+            if not ret:
+                return
+            yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class OpenCVReader(VideoReader):
+    backend = "opencv"
+
+    def __init__(self, source):
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Cannot open video: {source}")
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def read(self):
+        return self.cap.read()
+
+    def seek(self, frame_index: int):
+        if frame_index <= 0:
+            return
+        # OpenCV seeks to the previous keyframe and decodes forward to the frame
+        if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index) or \
+                int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) != frame_index:
+            raise RuntimeError(f"Cannot seek to frame {frame_index}")
+
+    def release(self):
+        self.cap.release()
+
+
+class PyAVReader(VideoReader):
+    backend = "pyav"
+
+    def __init__(self, source: str, threads: int = 0):
+        try:
+            self.container = av.open(source)
+        except Exception as e:
+            raise RuntimeError(f"Cannot open video: {source} ({e})")
+        self.stream = self.container.streams.video[0]
+        # Frame + slice threading inside the decoder; 0 lets FFmpeg pick
+        self.stream.thread_type = "AUTO"
+        self.stream.codec_context.thread_count = threads
+        rate = self.stream.average_rate or self.stream.guessed_rate
+        self.fps = float(rate) if rate else 0.0
+        self.frame_count = self.stream.frames or 0
+        if not self.frame_count and self.stream.duration and self.stream.time_base:
+            self.frame_count = int(self.stream.duration * self.stream.time_base * self.fps)
+        self._frames = self.container.decode(self.stream)
+        self._pending = None
+        # The display matrix is only exposed per frame, so peek at the first one
+        try:
+            self._pending = next(self._frames)
+        except (StopIteration, av.error.EOFError):
+            pass
+        self.rotation = self._rotation(self._pending)
+        width, height = self.stream.codec_context.width, self.stream.codec_context.height
+        self.width, self.height = (height, width) if self.rotation in (90, 270) else (width, height)
+
+    def _rotation(self, frame) -> int:
+        # VideoFrame.rotation is counter-clockwise; older files carry a clockwise "rotate" tag
+        if frame is not None and getattr(frame, "rotation", None):
+            return normalize_rotation(-frame.rotation)
+        return normalize_rotation(self.stream.metadata.get("rotate", 0))
+
+    def _to_bgr(self, frame) -> np.ndarray:
+        return rotate_frame(frame.to_ndarray(format="bgr24"), self.rotation)
+
+    def read(self):
+        if self._pending is not None:
+            frame, self._pending = self._pending, None
+            return True, self._to_bgr(frame)
+        try:
+            frame = next(self._frames)
+        except (StopIteration, av.error.EOFError):
+            return False, None
+        return True, self._to_bgr(frame)
+
+    def seek(self, frame_index: int):
+        if frame_index <= 0:
+            return
+        if not self.fps or not self.stream.time_base:
+            return super().seek(frame_index)
+        # Jump to the keyframe before the target, then decode forward. Half a
+        # frame of slack keeps float rounding from landing on a neighbour.
+        start = self.stream.start_time or 0
+        target = start + (frame_index - 0.5) / self.fps / self.stream.time_base
+        self.container.seek(int(target), stream=self.stream, backward=True, any_frame=False)
+        self._frames = self.container.decode(self.stream)
+        # Drop the frame peeked at open; seeking to the end must not replay it
+        self._pending = None
+        for frame in self._frames:
+            if frame.pts is not None and frame.pts >= target:
+                self._pending = frame
+                return
+
+    def release(self):
+        self.container.close()
+
+
+def _probe(source: str) -> dict:
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,avg_frame_rate,nb_frames:stream_tags=rotate:stream_side_data=rotation",
+        "-of", "json", source,
+    ]
+    out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    streams = json.loads(out).get("streams", [])
+    if not streams:
+        raise RuntimeError(f"No video stream in: {source}")
+    return streams[0]
+
+
+def _probe_rotation(info: dict) -> int:
+    """Clockwise rotation from ffprobe output: display matrix (counter-clockwise) or legacy tag"""
+    for side_data in info.get("side_data_list", []):
+        if "rotation" in side_data:
+            return normalize_rotation(-float(side_data["rotation"]))
+    return normalize_rotation(info.get("tags", {}).get("rotate", 0))
+
+
+class FFmpegPipeReader(VideoReader):
+    backend = "ffmpeg"
+
+    def __init__(self, source: str, threads: int = 0):
+        try:
+            info = _probe(source)
+        except (subprocess.CalledProcessError, RuntimeError) as e:
+            raise RuntimeError(f"Cannot open video: {source} ({e})")
+        # ffprobe reports the coded size; ffmpeg's own autorotate is disabled
+        # below and frames are turned here, like the PyAV reader does
+        self.rotation = _probe_rotation(info)
+        self._coded_size = (int(info["width"]), int(info["height"]))
+        width, height = self._coded_size
+        self.width, self.height = (height, width) if self.rotation in (90, 270) else (width, height)
+        self.fps = float(Fraction(info.get("avg_frame_rate", "0/1"))) if info.get("avg_frame_rate", "0/0") != "0/0" else 0.0
+        self.frame_count = int(info.get("nb_frames") or 0)
+        self._frame_bytes = self.width * self.height * 3
+        self._source = source
+        self._threads = threads
+        self.proc = self._start()
+
+    def _start(self, start_seconds: float = 0.0):
+        cmd = ["ffmpeg", "-v", "error", "-threads", str(self._threads)]
+        if start_seconds > 0:
+            # Input seeking: keyframe seek + exact decode up to the timestamp
+            cmd += ["-ss", f"{start_seconds:.6f}"]
+        cmd += ["-noautorotate", "-i", self._source, "-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=self._frame_bytes * 2)
+
+    def seek(self, frame_index: int):
+        if frame_index <= 0:
+            return
+        if not self.fps:
+            return super().seek(frame_index)
+        self.release()
+        self.proc = self._start((frame_index - 0.5) / self.fps)
+
+    def read(self):
+        buf = self.proc.stdout.read(self._frame_bytes)
+        if len(buf) < self._frame_bytes:
+            return False, None
+        width, height = self._coded_size
+        frame = np.frombuffer(buf, np.uint8).reshape(height, width, 3)
+        return True, rotate_frame(frame, self.rotation) if self.rotation else frame.copy()
+
+    def release(self):
+        if self.proc.stdout:
+            self.proc.stdout.close()
+        if self.proc.poll() is None:
+            self.proc.terminate()
+        self.proc.wait()
+
+
+# ----------------- Writers -------------------
+class VideoWriter:
+    """Common interface: cv2.VideoWriter-style write() taking BGR frames"""
+    backend = None
+
+    def write(self, frame: np.ndarray):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class OpenCVWriter(VideoWriter):
+    backend = "opencv"
+
+    def __init__(self, output_path: str, fps: float, frame_size: Tuple[int, int], out_size: Tuple[int, int] = None):
+        self.frame_size = frame_size
+        self.out_size = out_size or frame_size
+        # Try H.264 codec first (faster), fallback to mp4v
+        fourcc = cv2.VideoWriter_fourcc(*'avc1')
+        self.out = cv2.VideoWriter(output_path, fourcc, fps, self.out_size)
+        if not self.out.isOpened():
+            logger.warning("⚠️  H.264 codec not available, using mp4v")
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            self.out = cv2.VideoWriter(output_path, fourcc, fps, self.out_size)
+
+    def write(self, frame):
+        if self.out_size != self.frame_size:
+            frame = cv2.resize(frame, self.out_size, interpolation=cv2.INTER_AREA)
+        self.out.write(frame)
+
+    def release(self):
+        self.out.release()
+
+
+class PyAVWriter(VideoWriter):
+    backend = "pyav"
+
+    def __init__(self, output_path: str, fps: float, frame_size: Tuple[int, int], out_size: Tuple[int, int] = None,
+                 preset: str = DEFAULT_PRESET, crf: int = DEFAULT_CRF, faststart: bool = True, threads: int = 0,
+                 container_format: str = None, container_options: dict = None, gop_size: int = None,
+                 codec_options: dict = None, start_frame: int = 0):
+        options = dict(container_options or {})
+        if faststart and container_format is None:
+            options.setdefault("movflags", "+faststart")
+        self.container = av.open(output_path, mode="w", format=container_format, options=options)
+        self.stream = self.container.add_stream(
+            "libx264", rate=Fraction(fps).limit_denominator(1001),
+            options=dict({"preset": preset, "crf": str(crf)}, **(codec_options or {})),
+        )
+        self.out_size = out_size or scaled_size(*frame_size)
+        self.stream.width, self.stream.height = self.out_size
+        self.stream.pix_fmt = "yuv420p"
+        self.stream.thread_type = "AUTO"
+        self.stream.codec_context.thread_count = threads
+        if gop_size:
+            self.stream.codec_context.gop_size = gop_size
+        # Frame-index timestamps; start_frame continues the timeline of an earlier writer
+        self._next_pts = start_frame
+
+    def write(self, frame):
+        vf = av.VideoFrame.from_ndarray(frame, format="bgr24")
+        vf = vf.reformat(width=self.out_size[0], height=self.out_size[1], format="yuv420p")
+        vf.pts = self._next_pts
+        self._next_pts += 1
+        for packet in self.stream.encode(vf):
+            self.container.mux(packet)
+
+    def release(self):
+        for packet in self.stream.encode():
+            self.container.mux(packet)
+        self.container.close()
+
+
+class FFmpegPipeWriter(VideoWriter):
+    backend = "ffmpeg"
+
+    def __init__(self, output_path: str, fps: float, frame_size: Tuple[int, int], out_size: Tuple[int, int] = None,
+                 preset: str = DEFAULT_PRESET, crf: int = DEFAULT_CRF, faststart: bool = True, threads: int = 0,
+                 output_args: list = None):
+        self.frame_size = frame_size
+        self.out_size = out_size or scaled_size(*frame_size)
+        cmd = [
+            "ffmpeg", "-v", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{frame_size[0]}x{frame_size[1]}", "-r", f"{fps:.6f}", "-i", "-",
+        ]
+        if self.out_size != frame_size:
+            cmd += ["-vf", f"scale={self.out_size[0]}:{self.out_size[1]}"]
+        cmd += [
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+            "-pix_fmt", "yuv420p", "-threads", str(threads),
+        ]
+        if output_args:
+            cmd += output_args
+        elif faststart:
+            cmd += ["-movflags", "+faststart"]
+        cmd.append(output_path)
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        self.proc.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def release(self):
+        if self.proc.stdin:
+            self.proc.stdin.close()
+        if self.proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg encoder exited with code {self.proc.returncode}")
+
+
+# ----------------- Factories -----------------
+def open_video_reader(source, backend: str = "auto", threads: int = 0) -> VideoReader:
+    """Open a file for decoding. Non-path sources (device index, URLs) always use OpenCV."""
+    if not isinstance(source, str) or not os.path.exists(source):
+        return OpenCVReader(source)
+    backend = resolve_backend(backend)
+    if backend == "pyav":
+        return PyAVReader(source, threads=threads)
+    if backend == "ffmpeg":
+        return FFmpegPipeReader(source, threads=threads)
+    return OpenCVReader(source)
+
+
+def open_video_writer(
+    output_path: str,
+    fps: float,
+    frame_size: Tuple[int, int],
+    backend: str = "auto",
+    preset: str = DEFAULT_PRESET,
+    crf: int = DEFAULT_CRF,
+    faststart: bool = True,
+    max_height: Optional[int] = None,
+    threads: int = 0,
+) -> VideoWriter:
+    """
+    Open an encoder for BGR frames of `frame_size` (width, height).
+
+    pyav/ffmpeg encode libx264 with the given preset/CRF and +faststart so the
+    moov atom sits at the front and browsers can start playback immediately.
+    `max_height` downscales the output (e.g. 720) to cut encode time and size.
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    backend = resolve_backend(backend)
+    out_size = scaled_size(*frame_size, max_height=max_height)
+    fps = fps if fps and fps > 0 else 30.0
+    if backend == "pyav":
+        return PyAVWriter(output_path, fps, frame_size, out_size, preset=preset, crf=crf,
+                          faststart=faststart, threads=threads)
+    if backend == "ffmpeg":
+        return FFmpegPipeWriter(output_path, fps, frame_size, out_size, preset=preset, crf=crf,
+                                faststart=faststart, threads=threads)
+    # OpenCV keeps the source size unless a downscale was actually requested
+    if not max_height or frame_size[1] <= max_height:
+        out_size = None
+    return OpenCVWriter(output_path, fps, frame_size, out_size)
+
+
+def open_hls_writer(
+    stream_dir: str,
+    fps: float,
+    frame_size: Tuple[int, int],
+    backend: str = "auto",
+    preset: str = DEFAULT_PRESET,
+    crf: int = DEFAULT_CRF,
+    max_height: Optional[int] = None,
+    segment_seconds: int = DEFAULT_SEGMENT_SECONDS,
+    threads: int = 0,
+    resumable: bool = False,
+    start_frame: int = 0,
+) -> VideoWriter:
+    """
+    Encode into an HLS "event" playlist in `stream_dir`. Segments are closed
+    every `segment_seconds` (one keyframe per segment), so clients can play the
+    annotated footage while later frames are still being processed.
+
+    resumable=True lets the stream be written by a chain of writers (one per
+    checkpoint): the playlist is left open (see end_hls_playlist), B-frames
+    are off so timestamps stay monotonic across writers, and a writer with
+    start_frame > 0 appends to the existing playlist, continuing its timeline.
+    """
+    os.makedirs(stream_dir, exist_ok=True)
+    backend = resolve_backend(backend)
+    if backend == "opencv":
+        raise RuntimeError("Progressive HLS output needs PyAV or the ffmpeg binary")
+    out_size = scaled_size(*frame_size, max_height=max_height)
+    fps = fps if fps and fps > 0 else 30.0
+    gop = hls_segment_frames(fps, segment_seconds)
+    playlist = os.path.join(stream_dir, HLS_PLAYLIST)
+    # Segments are written under a temp name and renamed once complete
+    flags = ["temp_file"]
+    if resumable:
+        flags.append("omit_endlist")
+        if start_frame > 0:
+            flags.append("append_list")
+    hls_options = {
+        "hls_time": str(segment_seconds),
+        "hls_playlist_type": "event",
+        "hls_list_size": "0",
+        "hls_flags": "+".join(flags),
+        "hls_segment_filename": os.path.join(stream_dir, HLS_SEGMENT_PATTERN),
+    }
+    if backend == "pyav":
+        return PyAVWriter(playlist, fps, frame_size, out_size, preset=preset, crf=crf, threads=threads,
+                          container_format="hls", container_options=hls_options, gop_size=gop,
+                          codec_options={"bf": "0"} if resumable else None, start_frame=start_frame)
+    output_args = ["-g", str(gop), "-f", "hls"]
+    if resumable:
+        output_args = ["-bf", "0", "-output_ts_offset", f"{start_frame / fps:.6f}"] + output_args
+    for key, value in hls_options.items():
+        output_args += [f"-{key}", value]
+    return FFmpegPipeWriter(playlist, fps, frame_size, out_size, preset=preset, crf=crf,
+                            threads=threads, output_args=output_args)
+
+
+def hls_segment_frames(fps: float, segment_seconds: int = DEFAULT_SEGMENT_SECONDS) -> int:
+    """Frames per HLS segment (the GOP): segments can only be cut on its multiples"""
+    fps = fps if fps and fps > 0 else 30.0
+    return max(1, int(round(fps * segment_seconds)))
+
+
+def hls_segments(playlist_text: str) -> List[str]:
+    """Segment file names listed in a playlist"""
+    return [line.strip() for line in playlist_text.splitlines() if line.strip() and not line.startswith("#")]
+
+
+def read_hls_playlist(stream_dir: str) -> Optional[str]:
+    path = os.path.join(stream_dir, HLS_PLAYLIST)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def restore_hls_stream(stream_dir: str, playlist_text: Optional[str] = None):
+    """
+    Roll a resumable stream back to a checkpoint: the playlist as it was
+    then (none for a fresh start) and no segments written after it.
+    """
+    os.makedirs(stream_dir, exist_ok=True)
+    path = os.path.join(stream_dir, HLS_PLAYLIST)
+    if playlist_text is None:
+        if os.path.exists(path):
+            os.remove(path)
+    else:
+        with open(path + ".tmp", 'w') as f:
+            f.write(playlist_text)
+        os.replace(path + ".tmp", path)
+    keep = set(hls_segments(playlist_text or ""))
+    prefix, suffix = HLS_SEGMENT_PATTERN.split("%")[0], os.path.splitext(HLS_SEGMENT_PATTERN)[1]
+    for name in os.listdir(stream_dir):
+        if name.startswith(prefix) and (name.endswith(suffix) or name.endswith(".tmp")) and name not in keep:
+            os.remove(os.path.join(stream_dir, name))
+
+
+def end_hls_playlist(stream_dir: str):
+    """Mark a resumable stream finished, so players and the remux stop waiting for segments"""
+    path = os.path.join(stream_dir, HLS_PLAYLIST)
+    text = read_hls_playlist(stream_dir) or ""
+    if HLS_ENDLIST not in text:
+        with open(path, 'a') as f:
+            f.write(HLS_ENDLIST + "\n")
+
+
+def remux_to_mp4(source: str, output_path: str, backend: str = "auto",
+                 input_format: str = None, input_options: dict = None) -> str:
+    """Stream-copy (no re-encode) e.g. a finished HLS playlist into a faststart MP4"""
+    backend = resolve_backend(backend)
+    if backend == "ffmpeg":
+        cmd = ["ffmpeg", "-v", "error", "-y"]
+        if input_format:
+            cmd += ["-f", input_format]
+        for key, value in (input_options or {}).items():
+            cmd += [f"-{key}", value]
+        cmd += ["-i", source, "-c", "copy", "-movflags", "+faststart", output_path]
+        subprocess.run(cmd, check=True)
+        return output_path
+    if backend != "pyav":
+        raise RuntimeError("Remuxing needs PyAV or the ffmpeg binary")
+    src = av.open(source, format=input_format, options=input_options or {})
+    dst = av.open(output_path, mode="w", options={"movflags": "+faststart"})
+    try:
+        in_stream = src.streams.video[0]
+        out_stream = dst.add_stream_from_template(in_stream)
+        for packet in src.demux(in_stream):
+            if packet.dts is None:  # flush packet
+                continue
+            packet.stream = out_stream
+            dst.mux(packet)
+    finally:
+        dst.close()
+        src.close()
+    return output_path
+
+
+def concat_to_mp4(segment_paths, output_path: str, backend: str = "auto") -> str:
+    """
+    Join closed MP4 segments (same codec and size) into one faststart MP4.
+    pyav/ffmpeg stream-copy through the concat demuxer; OpenCV re-encodes.
+    """
+    backend = resolve_backend(backend)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    if backend == "opencv":
+        writer = None
+        try:
+            for path in segment_paths:
+                with OpenCVReader(path) as reader:
+                    if writer is None:
+                        writer = OpenCVWriter(output_path, reader.fps, (reader.width, reader.height))
+                    for frame in reader:
+                        writer.write(frame)
+        finally:
+            if writer is not None:
+                writer.release()
+        return output_path
+    list_path = output_path + ".concat.txt"
+    with open(list_path, "w") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        return remux_to_mp4(list_path, output_path, backend=backend,
+                            input_format="concat", input_options={"safe": "0"})
+    finally:
+        os.remove(list_path)